@@ -0,0 +1,160 @@
+'''
+Benchmarks for the cost weaving adds to method calls and attribute access.
+
+Run from the repository root with `python benchmarks/weaving.py`.  Results are printed as JSON, one entry per
+benchmark, giving the calls per second achieved.  Pass `--output FILE` to write them to a file instead, so that runs
+against different versions can be compared.
+@author probablytom
+'''
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drawer import weave_clazz, compile_clazz, weave_module, prelude, encore, error_handler, generate_around_advice
+from drawer import AdviceBuilder, ProfilingAspect
+
+def noop(attribute, context, *args, **kwargs):
+    pass
+
+
+def passing_around(attribute, context, *args, **kwargs):
+    return attribute(*args, **kwargs)
+
+
+def make_target():
+    class Target(object):
+        def __init__(self):
+            self.count = 0
+
+        def method(self):
+            return self.count
+
+        def unadvised(self):
+            return self.count
+
+    return Target
+
+
+def woven_with(aspect, weave=weave_clazz):
+    Target = make_target()
+    weave(Target, {Target.method: aspect})
+    return Target()
+
+
+def built_with_arounds(arounds):
+    Target = make_target()
+    builder = AdviceBuilder()
+    for _ in range(arounds):
+        builder.add_around(Target.method, passing_around)
+    builder.apply()
+    return Target()
+
+
+def method_call(target):
+    return lambda: target.method()
+
+
+def unadvised_call(target):
+    return lambda: target.unadvised()
+
+
+def field_access(target):
+    return lambda: target.count
+
+
+def call_benchmarks():
+    '''
+    :return: (name, function to call) pairs, each function exercising a single dispatch path.
+    '''
+    return [
+        ('baseline', method_call(make_target()())),
+        ('prelude', method_call(woven_with(prelude(noop)))),
+        ('encore', method_call(woven_with(encore(noop)))),
+        ('error_handler', method_call(woven_with(error_handler(noop)))),
+        ('generate_around_advice', method_call(woven_with(generate_around_advice(noop, noop)))),
+        ('compiled_prelude', method_call(woven_with(prelude(noop), weave=compile_clazz))),
+        ('profiling', method_call(woven_with(ProfilingAspect()))),
+        ('flexible_advice_1_around', method_call(built_with_arounds(1))),
+        ('flexible_advice_3_arounds', method_call(built_with_arounds(3))),
+        ('woven_unadvised_method', unadvised_call(woven_with(prelude(noop)))),
+        ('baseline_field_access', field_access(make_target()())),
+        ('woven_field_access', field_access(woven_with(prelude(noop)))),
+    ]
+
+
+def make_module(classes, methods):
+    module = types.ModuleType('benchmarked_module')
+    for class_index in range(classes):
+        namespace = dict(('method_%d' % index, lambda self: self) for index in range(methods))
+        namespace['__module__'] = module.__name__
+        setattr(module, 'Class%d' % class_index, type('Class%d' % class_index, (object,), namespace))
+    return module
+
+
+def weave_module_benchmark(classes, methods, repeat):
+    '''
+    Times weaving a freshly generated module, advising one method on each of its classes.
+    '''
+    timings = list()
+    for _ in range(repeat):
+        module = make_module(classes, methods)
+        aspect = prelude(noop)
+        advice = dict((getattr(module, 'Class%d' % index).method_0, aspect) for index in range(classes))
+
+        start = timeit.default_timer()
+        weave_module(module, advice)
+        timings.append(timeit.default_timer() - start)
+
+    return {
+        'name': 'weave_module_%d_classes_%d_methods' % (classes, methods),
+        'seconds': min(timings),
+        'calls_per_second': None
+    }
+
+
+def run(number, repeat):
+    results = list()
+
+    for name, function in call_benchmarks():
+        seconds = min(timeit.repeat(function, number=number, repeat=repeat))
+        results.append({
+            'name': name,
+            'seconds': seconds,
+            'calls_per_second': number / seconds
+        })
+
+    results.append(weave_module_benchmark(classes=1000, methods=20, repeat=repeat))
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'number': number,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=100000, help='calls per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per benchmark; the fastest is reported')
+    parser.add_argument('--output', help='a file to write the results to, rather than standard output')
+    arguments = parser.parse_args()
+
+    results = json.dumps(run(arguments.number, arguments.repeat), indent=2, sort_keys=True)
+
+    if arguments.output is None:
+        print(results)
+    else:
+        with open(arguments.output, 'w') as output:
+            output.write(results + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,17 @@
-from .weaver import weave_clazz, weave_module, unweave_all_classes, unweave_class, error_handler, generate_around_advice
-from .weaver import IdentityAspect, identity, prelude, encore
-from .advice_builder import AdviceBuilder
+from .weaver import weave_clazz, compile_clazz, weave_module, unweave_all_classes, unweave_class, error_handler
+from .weaver import IdentityAspect, identity, prelude, encore, generate_around_advice, invalidate_wrapper_cache
+from .weaver import asynchronous, unweave_module, advice_cache, AdviceTable, Weaving, weaving
+from .weaver import weave_many, PreludeAspect, EncoreAspect, ErrorHandlerAspect, AroundAspect, CallableAspect
+from .advice_builder import AdviceBuilder, FrozenAdvice
+from .object_filters import AttributeFilter, FilterMatcher
+from .profiling import ProfilingAspect
+from .sampling import SamplingAspect
+from .metrics import MetricsRegistry, MetricsAspect, default_registry
+from .memoization import MemoizingAspect
+from .batching import BatchingAspect
+from .background import BackgroundAspect, CallRecord
+from .import_hooks import ImportWeaver, import_weaver, weave_on_import
+from .pointcuts import Pointcut, Named, Within, Decorated, InModule
+from .streaming import StreamingAspect
+from .process_pool import ProcessPoolAspect, shared_pool, shutdown_shared_pool
+from .tracing import TracingAspect
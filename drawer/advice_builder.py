@@ -2,7 +2,7 @@
 A nice API to build advice from.
 @author probablytom
 '''
-from .weaver import IdentityAspect, weave_clazz
+from .weaver import IdentityAspect, weave_clazz, weave_many, invalidate_wrapper_cache, _hooks_of
 from functools import partial
 from inspect import ismethod, isfunction
 
@@ -15,44 +15,156 @@ class FlexibleAdvice(IdentityAspect):
         self.error_handlers = []
         self.around_functions = []
         self.target = target
+        self.woven_class = None
+        self.compile()
 
     def prelude(self, attribute, context, *args, **kwargs):
-        [prelude(attribute, context, *args, **kwargs) for prelude in self.preludes]
+        for prelude in self._preludes:
+            prelude(attribute, context, *args, **kwargs)
 
     def encore(self, attribute, context, result):
-        [encore(attribute, context, result) for encore in self.encores]
+        for encore in self._encores:
+            encore(attribute, context, result)
 
     def error_handling(self, attribute, context, exception):
 
-        if len(self.error_handlers) == 0:
+        if len(self._error_handlers) == 0:
             raise exception
 
-        [handler(attribute, context, exception) for handler in self.error_handlers]
+        for handler in self._error_handlers:
+            handler(attribute, context, exception)
 
     def around(self, attribute, context, *args, **kwargs):
 
-        def nest_around_call(nested_around, next_around):
-            return partial(next_around, nested_around, context)
-
-        nested_around = reduce(nest_around_call,
-                               self.around_functions[::-1],
-                               partial(super(FlexibleAdvice, self).around, attribute, context))
+        # The first around function is the outermost, so nest from the last one outwards.
+        nested_around = attribute
+        for around in self._nested_arounds:
+            nested_around = partial(around, nested_around, context)
 
         return nested_around(*args, **kwargs)
 
-    def apply_advice(self):
+    def compile(self):
+        '''
+        Fixes the preludes, encores, error handlers and around functions into the form they're run in.  Hooks with a
+        single prelude, encore or around function behind them call it directly, and hooks with nothing behind them are
+        left as IdentityAspect's so that weaving skips them.  AdviceBuilder does this whenever it adds to the advice;
+        call it again after changing the lists directly.
+        '''
+        self._preludes = tuple(self.preludes)
+        self._encores = tuple(self.encores)
+        self._error_handlers = tuple(self.error_handlers)
+        self._nested_arounds = tuple(reversed(self.around_functions))
+
+        for name, functions in (('prelude', self.preludes),
+                                ('encore', self.encores),
+                                ('error_handling', self.error_handlers),
+                                ('around', self.around_functions)):
+            self.__dict__.pop(name, None)
+
+            if len(functions) == 0:
+                setattr(self, name, getattr(super(FlexibleAdvice, self), name))
+            elif len(functions) == 1 and name != 'error_handling':
+                setattr(self, name, functions[0])
+
+        if self.woven_class is not None:
+            invalidate_wrapper_cache(self.woven_class)
+
+    def freeze(self):
+        '''
+        :return: a FrozenAdvice running the same hooks, which can't be changed.
+        '''
+        return FrozenAdvice.of(self.preludes, self.encores, self.error_handlers, self.around_functions)
+
+    def _prepare(self, freeze):
+        '''
+        Compiles the advice ready to weave.
+        :return: the class to weave, and the aspect to weave for the target in it.
+        '''
 
         # For callable objects.
         if callable(self.target) and not (isfunction(self.target) or ismethod(self.target)):
             self.target = self.target.__call__
 
-        if "im_class" in dir(self.target):
-            weave_clazz(self.target.im_class, {self.target: self})
-        elif "__class__" in dir(self.target):
-            weave_clazz(self.target.__class__, {self.target: self})
-        else:
+        self.compile()
+
+        clazz = getattr(self.target, 'im_class', None) or getattr(self.target, '__class__', None)
+        if clazz is None:
             raise Exception("Can't get a class from the target a FlexibleAdvice is trying to apply itself to!")
 
+        if freeze:
+            return clazz, self.freeze()
+
+        self.woven_class = clazz
+        return clazz, self
+
+    def apply_advice(self, freeze=False):
+        '''
+        Weaves the advice into its target's class.
+        :param freeze: whether to weave a frozen copy of the advice, which later changes to it won't affect.
+        '''
+        clazz, aspect = self._prepare(freeze)
+        weave_clazz(clazz, {self.target: aspect})
+
+
+def _frozen_prelude(self, attribute, context, *args, **kwargs):
+    for prelude in self.preludes:
+        prelude(attribute, context, *args, **kwargs)
+
+
+def _frozen_encore(self, attribute, context, result):
+    for encore in self.encores:
+        encore(attribute, context, result)
+
+
+def _frozen_error_handling(self, attribute, context, exception):
+    for handler in self.error_handlers:
+        handler(attribute, context, exception)
+
+
+def _frozen_around(self, attribute, context, *args, **kwargs):
+    nested_around = attribute
+    for around in self.nested_arounds:
+        nested_around = partial(around, nested_around, context)
+    return nested_around(*args, **kwargs)
+
+
+class FrozenAdvice(IdentityAspect):
+    '''
+    An unchangeable form of FlexibleAdvice, holding its hooks' functions in tuples and without an instance dictionary.
+    FrozenAdvice.of builds them, as a subclass implementing only the hooks with functions behind them, so that weaving
+    still skips the rest.  The subclasses are shared between all the FrozenAdvice with the same hooks.
+    '''
+    __slots__ = ('preludes', 'encores', 'error_handlers', 'nested_arounds')
+
+    _classes = dict()  # which of prelude, encore, error_handling and around are implemented, to classes doing so
+
+    def __init__(self, preludes, encores, error_handlers, around_functions):
+        set_field = super(FrozenAdvice, self).__setattr__
+        set_field('preludes', tuple(preludes))
+        set_field('encores', tuple(encores))
+        set_field('error_handlers', tuple(error_handlers))
+        set_field('nested_arounds', tuple(reversed(around_functions)))  # nested from the innermost outwards
+
+    def __setattr__(self, name, value):
+        raise TypeError("FrozenAdvice can't be changed; build and weave new advice instead.")
+
+    @classmethod
+    def of(cls, preludes, encores, error_handlers, around_functions):
+        implemented = (len(preludes) > 0, len(encores) > 0, len(error_handlers) > 0, len(around_functions) > 0)
+
+        clazz = cls._classes.get(implemented)
+        if clazz is None:
+            hooks = {'__slots__': ()}
+            for implements, name, hook in zip(implemented,
+                                              ('prelude', 'encore', 'error_handling', 'around'),
+                                              (_frozen_prelude, _frozen_encore,
+                                               _frozen_error_handling, _frozen_around)):
+                if implements:
+                    hooks[name] = hook
+            clazz = cls._classes.setdefault(implemented, type('FrozenAdvice', (cls,), hooks))
+
+        return clazz(preludes, encores, error_handlers, around_functions)
+
 
 class AdviceBuilder(object):
     def __init__(self):
@@ -61,47 +173,66 @@ class AdviceBuilder(object):
     def add_prelude(self, target, prelude):
         specific_advice = self.advice.get(target, FlexibleAdvice(target))
         specific_advice.preludes.append(prelude)
+        specific_advice.compile()
         self.advice[target] = specific_advice
         return self
 
     def add_encore(self, target, encore):
         specific_advice = self.advice.get(target, FlexibleAdvice(target))
         specific_advice.encores.append(encore)
+        specific_advice.compile()
         self.advice[target] = specific_advice
         return self
 
     def add_error_handler(self, target, err_handler):
         specific_advice = self.advice.get(target, FlexibleAdvice(target))
         specific_advice.error_handlers.append(err_handler)
+        specific_advice.compile()
         self.advice[target] = specific_advice
         return self
 
     def add_around(self, target, around):
         specific_advice = self.advice.get(target, FlexibleAdvice(target))
         specific_advice.around_functions.append(around)
+        specific_advice.compile()
         self.advice[target] = specific_advice
         return self
 
     def add_advice(self, target, advice):
         target_advice = self.advice.get(target, FlexibleAdvice(target))
 
-        if hasattr(advice, 'prelude'):
-            target_advice.preludes.append(advice.prelude)
+        # Only take the hooks the advice really implements, not those it inherits unchanged from IdentityAspect.
+        prelude, around, encore, error_handling = _hooks_of(advice)
+
+        if prelude is not None:
+            target_advice.preludes.append(prelude)
 
-        if hasattr(advice, 'encore'):
-            target_advice.encores.append(advice.encore)
+        if encore is not None:
+            target_advice.encores.append(encore)
 
-        if hasattr(advice, 'error_handling'):
-            target_advice.error_handlers.append(advice.error_handling)
+        if error_handling is not None:
+            target_advice.error_handlers.append(error_handling)
 
-        if hasattr(advice, 'around'):
-            target_advice.around_functions.append(advice.around)
+        if around is not None:
+            target_advice.around_functions.append(around)
 
+        target_advice.compile()
         self.advice[target] = target_advice
 
     def add_dictionary_advice(self, advice_dict):
         for target, advice in advice_dict.items():
             self.add_advice(target, advice)
 
-    def apply(self):
-        [aspect.apply_advice() for aspect in self.advice.values()]
+    def apply(self, freeze=False):
+        '''
+        Weaves the advice built so far.
+        :param freeze: whether to weave frozen copies of the advice, which later additions to the builder won't affect,
+        rather than the advice itself.
+        '''
+        advice_by_class = dict()
+        for flexible_advice in self.advice.values():
+            clazz, aspect = flexible_advice._prepare(freeze)
+            advice_by_class.setdefault(clazz, dict())[flexible_advice.target] = aspect
+
+        # Each class is woven once, with all of its advice.
+        weave_many(advice_by_class)
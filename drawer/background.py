@@ -0,0 +1,120 @@
+'''
+An aspect running another aspect's preludes and encores on background worker threads.
+@author probablytom
+'''
+from .weaver import IdentityAspect, _hooks_of
+from .profiling import method_name
+from collections import namedtuple
+from Queue import Queue, Full
+from threading import Thread, Lock
+
+
+# What an offloaded hook is run against: the advised method's name, the id of the object it was called on, and the
+# call's arguments (kwargs as a tuple of items) for preludes or its result for encores.
+CallRecord = namedtuple('CallRecord', ['hook', 'attribute', 'context_id', 'args', 'kwargs', 'result'])
+
+BLOCK, DROP, INLINE = 'block', 'drop', 'inline'
+
+
+class BackgroundAspect(IdentityAspect):
+    '''
+    Applies another aspect with its prelude and encore run on background worker threads, so advised calls pay only for
+    queueing a record of the call.  Its around and error handler still run inline.
+
+    Offloaded hooks are called with the record's fields instead of live objects: the advised method's qualified name
+    for the attribute, the id of the object it was called on for the context, and the arguments or result.  They
+    should be written to use only those, as the call will have moved on by the time they run.
+
+    At most `maxsize` records wait for a worker.  When the queue is full, `policy` decides what happens to new records:
+    BLOCK makes the caller wait for space, DROP discards them (counting them in `dropped`), and INLINE runs the hook in
+    the caller as though it weren't offloaded.
+    '''
+
+    def __init__(self, aspect, hooks=('prelude', 'encore'), workers=1, maxsize=1024, policy=BLOCK):
+        '''
+        :param aspect: the aspect whose hooks are run.
+        :param hooks: the names of the hooks to run in the background.
+        :param workers: the number of worker threads running offloaded hooks.
+        :param maxsize: the most records which may wait for a worker.
+        :param policy: one of BLOCK, DROP or INLINE, for records arriving while the queue is full.
+        '''
+        super(BackgroundAspect, self).__init__()
+        if policy not in (BLOCK, DROP, INLINE):
+            raise ValueError('Unknown backpressure policy: %r' % (policy,))
+
+        self.aspect = aspect
+        self.policy = policy
+        self.dropped = 0
+        self.failures = 0
+        self._counter_lock = Lock()
+        self._records = Queue(maxsize)
+
+        # Hooks the aspect doesn't implement are left as IdentityAspect's, so the weaver still skips them.
+        for name, hook in zip(('prelude', 'around', 'encore', 'error_handling'), _hooks_of(aspect)):
+            if hook is None:
+                continue
+            if name in hooks and name in ('prelude', 'encore'):
+                hook = getattr(self, '_offload_' + name)
+            setattr(self, name, hook)
+
+        self._workers = [Thread(target=self._work) for _ in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def _offload_prelude(self, attribute, context, *args, **kwargs):
+        self._submit(CallRecord('prelude', method_name(attribute), id(context), args, tuple(kwargs.items()), None))
+
+    def _offload_encore(self, attribute, context, result):
+        self._submit(CallRecord('encore', method_name(attribute), id(context), (), (), result))
+
+    def _submit(self, record):
+        if self.policy == BLOCK:
+            self._records.put(record)
+            return
+
+        try:
+            self._records.put_nowait(record)
+        except Full:
+            if self.policy == INLINE:
+                self._run(record)
+            else:
+                with self._counter_lock:
+                    self.dropped += 1
+
+    def _run(self, record):
+        try:
+            if record.hook == 'prelude':
+                self.aspect.prelude(record.attribute, record.context_id, *record.args, **dict(record.kwargs))
+            else:
+                self.aspect.encore(record.attribute, record.context_id, record.result)
+
+        # There's no caller left to raise to, so failures are only counted.
+        except Exception:
+            with self._counter_lock:
+                self.failures += 1
+
+    def _work(self):
+        while True:
+            record = self._records.get()
+            try:
+                if record is None:
+                    return
+                self._run(record)
+            finally:
+                self._records.task_done()
+
+    def join(self):
+        '''
+        Waits until every record queued so far has been run.
+        '''
+        self._records.join()
+
+    def close(self):
+        '''
+        Stops the worker threads once the records already queued have been run.
+        '''
+        for _ in self._workers:
+            self._records.put(None)
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,97 @@
+'''
+An aspect coalescing calls to advised methods into batches.
+@author probablytom
+'''
+from .weaver import CallableAspect
+from threading import Lock, Timer
+
+try:
+    from concurrent.futures import Future
+except ImportError:  # Python 2 without the futures backport installed.
+    Future = None
+
+
+class BatchingAspect(CallableAspect):
+    '''
+    Replaces calls to the methods it advises with batched calls to a bulk implementation.  Each call is queued and
+    immediately handed a future; once `size` calls are queued, or `window` seconds after the first of them, the queue
+    is passed to `batch` and each future completes with its call's result.
+
+    `batch` receives a list of (context, args, kwargs) tuples, one per call in the order they were made, and returns a
+    sequence of results in the same order.  If it raises, every call in the batch fails with the exception.
+
+    Advised methods return futures once woven, so mark them with @asynchronous to have other aspects' encores and error
+    handlers applied to their outcomes.  Use a separate aspect for each method whose calls are batched.
+    '''
+
+    def __init__(self, batch, size=None, window=None, future_type=Future):
+        '''
+        :param batch: a function running a list of calls together, returning their results.
+        :param size: the number of calls which triggers a batch, or None to batch only by time.
+        :param window: the most seconds a call waits for its batch, or None to batch only by size.
+        :param future_type: the class of future handed to callers, such as a concurrent.futures or Tornado Future.
+        '''
+        super(BatchingAspect, self).__init__()
+        if size is None and window is None:
+            raise ValueError('BatchingAspect needs a batch size, a time window, or both.')
+        if future_type is None:
+            raise ValueError('BatchingAspect needs a future_type when concurrent.futures is unavailable.')
+
+        self.batch = batch
+        self.size = size
+        self.window = window
+        self.future_type = future_type
+        self._pending = []  # (context, args, kwargs, future) tuples
+        self._timer = None
+        self._lock = Lock()
+
+    def around(self, attribute, context, *args, **kwargs):
+        future = self.future_type()
+        calls = None
+
+        with self._lock:
+            self._pending.append((context, args, kwargs, future))
+
+            if self.size is not None and len(self._pending) >= self.size:
+                calls = self._take_pending()
+
+            elif self.window is not None and self._timer is None:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # Batches run outside the lock, so callers can keep queueing while one is in progress.
+        if calls:
+            self._run(calls)
+
+        return future
+
+    def _take_pending(self):
+        calls, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return calls
+
+    def _run(self, calls):
+        try:
+            results = list(self.batch([call[:3] for call in calls]))
+            if len(results) != len(calls):
+                raise ValueError('Batch returned %d results for %d calls.' % (len(results), len(calls)))
+
+        except Exception as exception:
+            [call[3].set_exception(exception) for call in calls]
+            return
+
+        for call, result in zip(calls, results):
+            call[3].set_result(result)
+
+    def flush(self):
+        '''
+        Runs any queued calls as a batch now, without waiting for the batch to fill or its window to pass.
+        '''
+        with self._lock:
+            calls = self._take_pending()
+
+        if calls:
+            self._run(calls)
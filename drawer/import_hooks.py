@@ -0,0 +1,110 @@
+'''
+An import hook weaving advice into modules as they're loaded.
+@author probablytom
+'''
+from .weaver import weave_module
+from importlib import import_module
+from inspect import ismodule
+from threading import RLock
+import sys
+
+
+class ImportWeaver(object):
+    '''
+    A sys.meta_path finder which weaves advice registered against qualified names, such as "pkg.mod.Class.method" or
+    "pkg.mod.function", into each module as it's imported.  Names are indexed by the modules they could belong to, so
+    loading a module costs only a lookup unless something in it is advised, and nothing is scanned.  Names must be
+    qualified with the module their class or function is defined in, not one which imports it.
+    '''
+
+    def __init__(self):
+        self._advice = dict()  # qualified names to aspects, until they're woven
+        self._names_by_module = dict()  # every dotted prefix of a qualified name to the names sharing it
+        self._loading = set()
+        self._lock = RLock()
+
+    def register(self, qualified_name, aspect):
+        '''
+        Registers an aspect to weave into the method or function with the supplied name when its module is imported.
+        If the module has already been imported, it's woven straight away.
+        :param qualified_name: the dotted name of a method or function, starting with its module's name.
+        :param aspect: the aspect to apply.
+        '''
+        parts = qualified_name.split('.')
+        prefixes = ['.'.join(parts[:length]) for length in range(1, len(parts))]
+
+        with self._lock:
+            self._advice[qualified_name] = aspect
+            for prefix in prefixes:
+                self._names_by_module.setdefault(prefix, set()).add(qualified_name)
+
+        for prefix in prefixes:
+            if sys.modules.get(prefix) is not None:
+                self._weave(prefix)
+
+    def pending(self):
+        '''
+        :return: the qualified names registered but not yet woven.
+        '''
+        return set(self._advice)
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_module(self, fullname, path=None):
+        if fullname in self._names_by_module and fullname not in self._loading:
+            return self
+        return None
+
+    def load_module(self, fullname):
+        # Import the module the usual way, with this finder stepping aside for it, then weave it.
+        self._loading.add(fullname)
+        try:
+            mod = import_module(fullname)
+        finally:
+            self._loading.discard(fullname)
+
+        self._weave(fullname)
+        return mod
+
+    def _weave(self, module_name):
+        mod = sys.modules[module_name]
+        advice = dict()
+
+        with self._lock:
+            for qualified_name in list(self._names_by_module.get(module_name, ())):
+                target = mod
+                try:
+                    for part in qualified_name[len(module_name) + 1:].split('.'):
+                        target = getattr(target, part)
+                        if ismodule(target):
+                            raise AttributeError(part)
+                except AttributeError:
+                    continue  # Perhaps in a submodule, which resolves it when it's imported.
+
+                advice[target] = self._advice.pop(qualified_name)
+                for names in self._names_by_module.values():
+                    names.discard(qualified_name)
+
+            for prefix, names in list(self._names_by_module.items()):
+                if len(names) == 0:
+                    del self._names_by_module[prefix]
+
+        if len(advice) > 0:
+            weave_module(mod, advice)
+
+
+import_weaver = ImportWeaver()
+
+
+def weave_on_import(qualified_name, aspect):
+    '''
+    Registers an aspect with the default import hook, installing it if need be.  See ImportWeaver.register.
+    '''
+    import_weaver.install()
+    import_weaver.register(qualified_name, aspect)
@@ -0,0 +1,86 @@
+'''
+An aspect caching the results of advised methods.
+@author probablytom
+'''
+from .weaver import CallableAspect, _advised_method
+from collections import OrderedDict
+from threading import Lock
+from timeit import default_timer
+
+
+class MemoizingAspect(CallableAspect):
+    '''
+    Caches the results of the methods it advises, keyed on the method and its arguments, so that repeated calls return
+    the cached result without running the method.  Calls with unhashable arguments, and calls which raise, are never
+    cached.
+
+    The cache holds at most `maxsize` results, evicting the least recently used first, and results older than `ttl`
+    seconds are treated as missing.  With `per_instance`, each object a method is called on gets results of its own;
+    otherwise calls with equal arguments share results whichever object they were made on.
+
+    Use the aspect itself with weave_clazz, or as an around function with AdviceBuilder.add_around.
+    '''
+
+    def __init__(self, maxsize=128, ttl=None, per_instance=False, timer=default_timer):
+        '''
+        :param maxsize: the most results to cache, or None for no limit.
+        :param ttl: the seconds a result stays valid for, or None for no expiry.
+        :param per_instance: whether results are cached separately for each object methods are called on.
+        :param timer: a function returning the current time in seconds.
+        '''
+        super(MemoizingAspect, self).__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.per_instance = per_instance
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()  # keys to (expiry time, result) pairs, least recently used first
+        self._lock = Lock()
+
+    def around(self, attribute, context, *args, **kwargs):
+        method = _advised_method(attribute)
+
+        try:
+            key = (getattr(method, 'im_func', method), context if self.per_instance else None, args,
+                   frozenset(kwargs.items()) if kwargs else None)
+            hash(key)
+        except TypeError:
+            return attribute(*args, **kwargs)
+
+        with self._lock:
+            entry = self._results.pop(key, None)
+            if entry is not None and (entry[0] is None or entry[0] > self.timer()):
+                self._results[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        result = attribute(*args, **kwargs)
+
+        with self._lock:
+            self._results[key] = (None if self.ttl is None else self.timer() + self.ttl, result)
+            while self.maxsize is not None and len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def invalidate(self, method=None, context=None):
+        '''
+        Discards cached results: those of the given method, those cached for the given object (with per_instance), or
+        both.  With neither given, discards everything.
+        :param method: a method reference, as used in advice, such as Target.foo.
+        :param context: an object the method was called on.
+        '''
+        method = getattr(method, 'im_func', method)
+
+        with self._lock:
+            for key in list(self._results.keys()):
+                if (method is None or key[0] is method) and (context is None or key[1] is context):
+                    del self._results[key]
+
+    def statistics(self):
+        '''
+        :return: a dictionary of the cache's hits, misses and current size.
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._results)}
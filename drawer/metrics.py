@@ -0,0 +1,209 @@
+'''
+Per-method metrics for woven methods, exportable as Prometheus exposition text or JSON.
+@author probablytom
+'''
+from .weaver import IdentityAspect, _advised_method
+from .profiling import DEFAULT_BUCKETS, method_name
+from array import array
+from bisect import bisect_left
+from threading import local, Lock
+from timeit import default_timer
+import json
+import os
+import tempfile
+
+_CALLS, _EXCEPTIONS, _LATENCY_SUM, _LATENCY_BUCKETS = 0, 1, 2, 3
+
+
+def _write_rendered(destination, rendered):
+    '''
+    Writes text to a file-like object, or atomically replaces the file at the given path with it.
+    '''
+    if hasattr(destination, 'write'):
+        destination.write(rendered)
+        return
+
+    directory = os.path.dirname(os.path.abspath(destination))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.drawer-')
+    try:
+        with os.fdopen(descriptor, 'w') as temporary_file:
+            temporary_file.write(rendered)
+        os.rename(temporary_path, destination)
+    except Exception:
+        os.remove(temporary_path)
+        raise
+
+
+class MetricsRegistry(object):
+    '''
+    Counts the calls made to, exceptions raised by and latency of woven methods which opt in by being advised with one
+    of the registry's MetricsAspects.
+
+    Each thread counts into its own preallocated cells, so recording never contends for a lock or loses updates to
+    another thread; the threads' counts are only summed when the metrics are rendered.
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, timer=default_timer):
+        '''
+        :param buckets: the ascending upper bounds, in seconds, of the latency histogram's buckets.
+        :param timer: a function returning the current time in seconds.
+        '''
+        self.buckets = tuple(buckets)
+        self.timer = timer
+        self._names = dict()  # functions to the names their metrics are labelled with
+        self._local = local()
+        self._thread_cells = list()  # every thread's dictionary of functions to cells
+        self._lock = Lock()
+
+    def aspect(self):
+        '''
+        :return: an aspect recording the metrics of the methods it advises in this registry.
+        '''
+        return MetricsAspect(self)
+
+    def cells(self, attribute):
+        '''
+        :return: the calling thread's cells for the supplied woven method.
+        '''
+        try:
+            thread_cells = self._local.cells
+        except AttributeError:
+            thread_cells = self._local.cells = dict()
+            with self._lock:
+                self._thread_cells.append(thread_cells)
+
+        method = _advised_method(attribute)
+        function = getattr(method, 'im_func', method)
+        cells = thread_cells.get(function)
+
+        if cells is None:
+            with self._lock:
+                self._names.setdefault(function, method_name(method))
+            cells = thread_cells[function] = array('d', [0.0]) * (_LATENCY_BUCKETS + len(self.buckets) + 1)
+
+        return cells
+
+    def totals(self):
+        '''
+        :return: a dictionary of method names to dictionaries of their calls, exceptions, latency_sum and
+        latency_buckets.  The buckets are a list of (upper bound, count) pairs, counting calls no slower than the
+        bound as Prometheus does, the last of which has an upper bound of None.
+        '''
+        with self._lock:
+            thread_cells = [dict(cells) for cells in self._thread_cells]
+            names = dict(self._names)
+
+        summed = dict()
+        for cells in thread_cells:
+            for function, method_cells in cells.items():
+                total = summed.setdefault(names[function], [0.0] * len(method_cells))
+                for index, value in enumerate(method_cells):
+                    total[index] += value
+
+        totals = dict()
+        for name, total in summed.items():
+            cumulative, buckets = 0, list()
+            for bound, count in zip(self.buckets + (None,), total[_LATENCY_BUCKETS:]):
+                cumulative += int(count)
+                buckets.append((bound, cumulative))
+
+            totals[name] = {
+                'calls': int(total[_CALLS]),
+                'exceptions': int(total[_EXCEPTIONS]),
+                'latency_sum': total[_LATENCY_SUM],
+                'latency_buckets': buckets
+            }
+
+        return totals
+
+    def render_json(self):
+        return json.dumps(self.totals(), sort_keys=True)
+
+    def render_prometheus(self):
+        totals = sorted(self.totals().items())
+        lines = list()
+
+        def label(name):
+            return 'method="%s"' % name.replace('\\', '\\\\').replace('"', '\\"')
+
+        lines.append('# HELP drawer_calls_total Calls made to woven methods.')
+        lines.append('# TYPE drawer_calls_total counter')
+        lines.extend('drawer_calls_total{%s} %d' % (label(name), total['calls']) for name, total in totals)
+
+        lines.append('# HELP drawer_exceptions_total Exceptions raised by woven methods.')
+        lines.append('# TYPE drawer_exceptions_total counter')
+        lines.extend('drawer_exceptions_total{%s} %d' % (label(name), total['exceptions']) for name, total in totals)
+
+        lines.append('# HELP drawer_latency_seconds Latency of woven methods.')
+        lines.append('# TYPE drawer_latency_seconds histogram')
+        for name, total in totals:
+            for bound, count in total['latency_buckets']:
+                bound = '+Inf' if bound is None else repr(bound)
+                lines.append('drawer_latency_seconds_bucket{%s,le="%s"} %d' % (label(name), bound, count))
+            lines.append('drawer_latency_seconds_sum{%s} %r' % (label(name), total['latency_sum']))
+            lines.append('drawer_latency_seconds_count{%s} %d' % (label(name), total['calls']))
+
+        return '\n'.join(lines) + '\n'
+
+    def render(self, format='prometheus'):
+        '''
+        :param format: 'prometheus', for the Prometheus text exposition format, or 'json'.
+        :return: the metrics, rendered in the given format.
+        '''
+        if format == 'prometheus':
+            return self.render_prometheus()
+        elif format == 'json':
+            return self.render_json()
+        raise ValueError("Unknown metrics format %r; expected 'prometheus' or 'json'." % format)
+
+    def write(self, destination, format='prometheus'):
+        '''
+        Writes the rendered metrics to a file-like object, or replaces the file at the given path with them.  Files are
+        replaced atomically, so that collectors reading them (such as the Prometheus node exporter's textfile
+        collector) never see a partly written file.
+        :param destination: a path, or an object with a write method.
+        :param format: as for render.
+        '''
+        _write_rendered(destination, self.render(format))
+
+    def reset(self):
+        '''
+        Zeroes every method's metrics.
+        '''
+        with self._lock:
+            for cells in self._thread_cells:
+                for method_cells in cells.values():
+                    for index in range(len(method_cells)):
+                        method_cells[index] = 0.0
+
+
+class MetricsAspect(IdentityAspect):
+    '''
+    Records the calls made to, exceptions raised by and latency of the methods it advises in a MetricsRegistry.
+    '''
+
+    def __init__(self, registry=None):
+        '''
+        :param registry: the registry to record in, or None for drawer's default registry.
+        '''
+        super(MetricsAspect, self).__init__()
+        self.registry = default_registry if registry is None else registry
+
+    def around(self, attribute, context, *args, **kwargs):
+        registry = self.registry
+        cells = registry.cells(attribute)
+
+        start = registry.timer()
+        try:
+            return attribute(*args, **kwargs)
+        except Exception:
+            cells[_EXCEPTIONS] += 1
+            raise
+        finally:
+            elapsed = registry.timer() - start
+            cells[_CALLS] += 1
+            cells[_LATENCY_SUM] += elapsed
+            cells[_LATENCY_BUCKETS + bisect_left(registry.buckets, elapsed)] += 1
+
+
+default_registry = MetricsRegistry()
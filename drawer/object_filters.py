@@ -0,0 +1,97 @@
+'''
+Matching of the objects filters in advice against the objects whose methods are called.
+@author probablytom
+'''
+import inspect
+
+
+_missing = object()
+
+
+class AttributeFilter(object):
+    '''
+    An object filter matching objects with an attribute of the given name that equals the given value.
+    '''
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __call__(self, obj):
+        return getattr(obj, self.name, _missing) == self.value
+
+    def __eq__(self, other):
+        return isinstance(other, AttributeFilter) and (self.name, self.value) == (other.name, other.value)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.name, self.value))
+
+    def __repr__(self):
+        return 'AttributeFilter(%r, %r)' % (self.name, self.value)
+
+
+class FilterMatcher(object):
+    '''
+    Finds the value mapped to by the first filter in a dictionary of object filters which matches a given object.
+
+    Filters can be AttributeFilters, classes (matching their instances) or any other callable taking the object and
+    returning whether it matches.  Rather than trying each filter in turn, AttributeFilters are indexed by attribute
+    name and value, and classes are resolved against the object's type once and remembered, so that only arbitrary
+    callables are tried one by one.  AttributeFilters take precedence over classes, which take precedence over
+    callables; where several classes match, the one nearest the object's type in its method resolution order wins.
+    '''
+
+    def __init__(self, filters):
+        '''
+        :param filters: a dictionary of object filters to the values to find for the objects they match.
+        '''
+        attribute_index = dict()
+        self.classes = dict()
+        self.predicates = list()
+
+        for object_filter, value in filters.items():
+            if isinstance(object_filter, AttributeFilter):
+                attribute_index.setdefault(object_filter.name, dict())[object_filter.value] = value
+            elif inspect.isclass(object_filter):
+                self.classes[object_filter] = value
+            else:
+                self.predicates.append((object_filter, value))
+
+        self.attribute_index = tuple(attribute_index.items())
+        self._values_by_type = dict()
+
+    def match(self, obj):
+        '''
+        :return: the value for the first filter matching the supplied object, or None if no filter matches it.
+        '''
+        for name, values in self.attribute_index:
+            try:
+                value = values.get(getattr(obj, name, _missing), _missing)
+            except TypeError:  # Unhashable attribute values can't match.
+                value = _missing
+
+            if value is not _missing:
+                return value
+
+        try:
+            value = self._values_by_type[type(obj)]
+        except KeyError:
+            value = self._values_by_type[type(obj)] = self._match_type(type(obj))
+
+        if value is not _missing:
+            return value
+
+        for predicate, value in self.predicates:
+            if predicate(obj):
+                return value
+
+        return None
+
+    def _match_type(self, clazz):
+        for superclass in inspect.getmro(clazz):
+            if superclass in self.classes:
+                return self.classes[superclass]
+        return _missing
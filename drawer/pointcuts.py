@@ -0,0 +1,150 @@
+'''
+Pointcut expressions, selecting the methods and functions advice applies to by pattern instead of by reference.
+@author probablytom
+'''
+from fnmatch import translate
+from inspect import ismethod
+import re
+
+
+class Pointcut(object):
+    '''
+    A predicate over methods and module functions, usable as a key in advice dictionaries in place of a method
+    reference.  Pointcuts combine with & (both), | (either) and ~ (not).
+
+    Pointcuts are matched once, when advice is woven, against the methods of the classes being woven (and, for
+    weave_module, the functions of the module), and replaced with the concrete methods they match.  Woven calls never
+    evaluate them, so they cost the same as advice listing each method.  A method may only be matched by pointcuts
+    with the same aspect; weaving raises ValueError if it's matched by pointcuts with different ones.
+    '''
+
+    def matches(self, clazz, name, function):
+        '''
+        :param clazz: the class the method is being woven for, or None for a module function.
+        :param name: the name the method or function is found under.
+        :param function: the method's underlying function, or the module function.
+        :return: whether the advice applies.
+        '''
+        raise NotImplementedError()
+
+    def __and__(self, other):
+        return _Combined(all, (self, other))
+
+    def __or__(self, other):
+        return _Combined(any, (self, other))
+
+    def __invert__(self):
+        return _Inverted(self)
+
+
+class _Combined(Pointcut):
+    def __init__(self, combine, pointcuts):
+        self.combine = combine
+        self.pointcuts = pointcuts
+
+    def matches(self, clazz, name, function):
+        return self.combine(pointcut.matches(clazz, name, function) for pointcut in self.pointcuts)
+
+
+class _Inverted(Pointcut):
+    def __init__(self, pointcut):
+        self.pointcut = pointcut
+
+    def matches(self, clazz, name, function):
+        return not self.pointcut.matches(clazz, name, function)
+
+
+class Named(Pointcut):
+    '''
+    Matches methods and functions whose names match a glob, such as 'get_*'.  Private and special names, starting with
+    an underscore, are only matched by globs which start with one too.
+    '''
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._expression = re.compile(translate(pattern))
+
+    def matches(self, clazz, name, function):
+        if name.startswith('_') and not self.pattern.startswith('_'):
+            return False
+        return self._expression.match(name) is not None
+
+
+class Within(Pointcut):
+    '''
+    Matches the methods of the supplied classes and their subclasses, including those they inherit.
+    '''
+
+    def __init__(self, *classes):
+        self.classes = classes
+
+    def matches(self, clazz, name, function):
+        return clazz is not None and issubclass(clazz, self.classes)
+
+
+class Decorated(Pointcut):
+    '''
+    Matches methods and functions carrying a decorator's marker attribute, such as '__asynchronous__' for those marked
+    with @asynchronous.
+    '''
+
+    def __init__(self, marker):
+        self.marker = marker
+
+    def matches(self, clazz, name, function):
+        return bool(getattr(function, self.marker, False))
+
+
+class InModule(Pointcut):
+    '''
+    Matches methods and functions defined in modules whose dotted names match a glob, such as 'myapp.storage.*'.
+    '''
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._expression = re.compile(translate(pattern))
+
+    def matches(self, clazz, name, function):
+        return self._expression.match(getattr(function, '__module__', None) or '') is not None
+
+
+def split_pointcuts(advice):
+    '''
+    :return: the supplied advice's pointcut->aspect pairs, and a dictionary of the rest of its advice.
+    '''
+    pointcuts = [(key, aspect) for key, aspect in advice.items() if isinstance(key, Pointcut)]
+    if len(pointcuts) == 0:
+        return pointcuts, advice
+    return pointcuts, dict((key, aspect) for key, aspect in advice.items() if not isinstance(key, Pointcut))
+
+
+def match_function(pointcuts, clazz, name, function):
+    '''
+    :return: the aspect of the pointcuts matching the supplied method or function, or None if none match.
+    :raises ValueError: if pointcuts advising it with different aspects overlap, as neither takes precedence.
+    '''
+    matched = None
+    for pointcut, aspect in pointcuts:
+        if not pointcut.matches(clazz, name, function):
+            continue
+        if matched is not None and matched is not aspect:
+            owner = name if clazz is None else clazz.__name__ + '.' + name
+            raise ValueError('Pointcuts advising %s with different aspects overlap; combine them with & and ~ so '
+                             'that only one matches.' % owner)
+        matched = aspect
+    return matched
+
+
+def resolve_methods(pointcuts, clazz):
+    '''
+    :return: a dictionary of method reference->aspect mappings for the methods of the supplied class that the supplied
+    pointcut->aspect pairs match.
+    '''
+    advice = dict()
+    for name in dir(clazz):
+        attribute = getattr(clazz, name, None)
+        if ismethod(attribute) and attribute.im_self is None:
+            aspect = match_function(pointcuts, clazz, name, attribute.im_func)
+            if aspect is not None:
+                advice[attribute] = aspect
+    return advice
@@ -0,0 +1,176 @@
+'''
+An aspect running advised methods in a pool of worker processes.
+@author probablytom
+'''
+from .weaver import CallableAspect, _reference_attributes
+from multiprocessing import Pool
+from threading import Lock
+import atexit
+import cPickle as pickle
+import inspect
+from types import MethodType
+
+_shared_pool = None
+_shared_pool_lock = Lock()
+
+
+def shared_pool():
+    '''
+    :return: the process pool ProcessPoolAspects use unless given another, started on first use.
+    '''
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = Pool()
+        return _shared_pool
+
+
+@atexit.register
+def shutdown_shared_pool():
+    '''
+    Stops the shared process pool's workers, once they've finished the calls already submitted.  The pool is started
+    again if it's used afterwards.
+    '''
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool.join()
+            _shared_pool = None
+
+
+def _original_function(clazz, name):
+    '''
+    :return: the unadvised function a class's instances have under the supplied name, or None.
+    '''
+    for klass in inspect.getmro(clazz):
+        compiled = _reference_attributes.get(klass, dict()).get(name)
+        if compiled is not None:
+            return compiled[1]
+        if name in vars(klass):
+            return vars(klass)[name] if inspect.isfunction(vars(klass)[name]) else None
+    return None
+
+
+def _run_call(payload):
+    '''
+    Runs a pickled call in a worker process.
+    :return: a pair of the call's result and None, or None and the exception it raised.
+    '''
+    try:
+        clazz, name, state, restore_state, args, kwargs = pickle.loads(payload)
+        context = state if restore_state is None else restore_state(clazz, state)
+        return _original_function(clazz, name)(context, *args, **kwargs), None
+    except Exception as exception:
+        return None, exception
+
+
+class ProcessPoolAspect(CallableAspect):
+    '''
+    Runs the methods it advises in worker processes, so CPU-bound methods can use every core.  The object a method is
+    called on is pickled and sent to the worker with the call's arguments, and the method's result is pickled back.
+    Changes the method makes to the object in the worker are lost.  Supply extract_state and restore_state to send only
+    what the method needs when objects are large or can't be pickled.
+
+    Calls which can't be sent to a worker, because something about them can't be pickled, run inline instead, and are
+    counted in `inline_calls`.  So do calls to methods advised by more than one around, which can't be separated from
+    the other arounds.
+
+    Advised methods return their results as usual, blocking until the worker finishes, unless a future_type is given,
+    in which case they return futures for them straight away; mark such methods with @asynchronous.
+    '''
+
+    def __init__(self, pool=None, extract_state=None, restore_state=None, future_type=None):
+        '''
+        :param pool: a multiprocessing Pool to run calls in, by default the shared pool.
+        :param extract_state: a function returning the picklable state of an object methods are called on.
+        :param restore_state: a module-level function taking an object's class and extracted state, returning an
+        object to call the method on in the worker.
+        :param future_type: the class of future to return results through, or None to return results themselves.
+        '''
+        super(ProcessPoolAspect, self).__init__()
+        self.pool = pool
+        self.extract_state = extract_state
+        self.restore_state = restore_state
+        self.future_type = future_type
+        self.inline_calls = 0
+
+    def _payload(self, attribute, context, args, kwargs):
+        '''
+        :return: the pickled call, or None if it can't be run in a worker.
+        '''
+        function = getattr(attribute, 'im_func', None)
+        clazz = type(context)
+
+        if function is None or _original_function(clazz, function.__name__) is not function:
+            return None
+
+        state = context if self.extract_state is None else self.extract_state(context)
+        try:
+            return pickle.dumps((clazz, function.__name__, state, self.restore_state, args, kwargs),
+                                pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+
+    def _inline(self, attribute, args, kwargs):
+        self.inline_calls += 1
+        result = attribute(*args, **kwargs)
+        if self.future_type is None:
+            return result
+
+        future = self.future_type()
+        future.set_result(result)
+        return future
+
+    def around(self, attribute, context, *args, **kwargs):
+        payload = self._payload(attribute, context, args, kwargs)
+        if payload is None:
+            return self._inline(attribute, args, kwargs)
+
+        pool = self.pool or shared_pool()
+
+        if self.future_type is None:
+            result, exception = pool.apply(_run_call, (payload,))
+            if exception is not None:
+                raise exception
+            return result
+
+        future = self.future_type()
+
+        def complete(outcome):
+            if outcome[1] is not None:
+                future.set_exception(outcome[1])
+            else:
+                future.set_result(outcome[0])
+
+        pool.apply_async(_run_call, (payload,), callback=complete)
+        return future
+
+    def map(self, method, calls, chunksize=None):
+        '''
+        Runs many calls of an advised method in the pool together, sending them to workers in chunks, which costs much
+        less per call than calling the method repeatedly.  Calls which can't be pickled run inline.
+        :param method: a method reference, such as Target.foo.
+        :param calls: an iterable of (object, args) pairs, each calling the method on the object with the arguments.
+        :param chunksize: the number of calls sent to a worker at a time.
+        :return: a list of the calls' results, in order.
+        '''
+        calls = [(MethodType(method.im_func, context, type(context)), context, tuple(args)) for context, args in calls]
+        payloads = [self._payload(attribute, context, args, dict()) for attribute, context, args in calls]
+
+        pooled = [payload for payload in payloads if payload is not None]
+        outcomes = iter((self.pool or shared_pool()).map(_run_call, pooled, chunksize))
+
+        results = list()
+        for (attribute, _, args), payload in zip(calls, payloads):
+            if payload is None:
+                self.inline_calls += 1
+                results.append(attribute(*args))
+                continue
+
+            result, exception = next(outcomes)
+            if exception is not None:
+                raise exception
+            results.append(result)
+
+        return results
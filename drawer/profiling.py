@@ -0,0 +1,130 @@
+'''
+An aspect for profiling advised methods.
+@author probablytom
+'''
+from .weaver import IdentityAspect, _advised_method
+from array import array
+from bisect import bisect_left
+from threading import local, Lock
+from timeit import default_timer
+
+
+# Upper bounds, in seconds, of the latency histogram's buckets.  Anything slower lands in a final overflow bucket.
+DEFAULT_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+_CALLS, _TOTAL_TIME, _SELF_TIME, _HISTOGRAM = 0, 1, 2, 3
+
+
+def method_name(attribute):
+    '''
+    :return: a name for a woven method, qualified with its class's name where it has one.
+    '''
+    function = getattr(attribute, 'im_func', attribute)
+    owner = getattr(attribute, 'im_class', None)
+    name = getattr(function, '__name__', repr(function))
+    return name if owner is None else owner.__name__ + '.' + name
+
+
+class ProfilingAspect(IdentityAspect):
+    '''
+    Records the number of calls, total time, self time (total time less the time spent in other methods advised by
+    the same aspect) and a latency histogram for each method the aspect is applied to.  Each thread keeps each method's
+    figures in a single preallocated array of its own, so recording a call neither allocates nor contends with other
+    threads; the threads' figures are summed when a snapshot is taken.
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, timer=default_timer):
+        '''
+        :param buckets: the ascending upper bounds, in seconds, of the latency histogram's buckets.
+        :param timer: a function returning the current time in seconds.
+        '''
+        super(ProfilingAspect, self).__init__()
+        self.buckets = tuple(buckets)
+        self.timer = timer
+        self._names = dict()  # functions to the names of the methods they're behind
+        self._thread_records = list()  # each thread's dictionary of functions to the arrays holding their figures
+        self._lock = Lock()
+        self._local = local()
+
+    def around(self, attribute, context, *args, **kwargs):
+        method = _advised_method(attribute)
+        function = getattr(method, 'im_func', method)
+
+        try:
+            records, children = self._local.records, self._local.children
+        except AttributeError:
+            records, children = self._new_thread()
+
+        record = records.get(function)
+        if record is None:
+            record = self._new_record(records, method, function)
+
+        # Time spent in nested advised calls is accumulated here, to be discounted from this call's self time.
+        children.append(0.0)
+        start = self.timer()
+        try:
+            return attribute(*args, **kwargs)
+        finally:
+            elapsed = self.timer() - start
+            child_time = children.pop()
+            if children:
+                children[-1] += elapsed
+
+            record[_CALLS] += 1
+            record[_TOTAL_TIME] += elapsed
+            record[_SELF_TIME] += elapsed - child_time
+            record[_HISTOGRAM + bisect_left(self.buckets, elapsed)] += 1
+
+    def _new_thread(self):
+        records = self._local.records = dict()
+        children = self._local.children = list()
+        with self._lock:
+            self._thread_records.append(records)
+        return records, children
+
+    def _new_record(self, records, method, function):
+        with self._lock:
+            self._names.setdefault(function, method_name(method))
+
+        record = array('d', [0.0]) * (_HISTOGRAM + len(self.buckets) + 1)
+        records[function] = record
+        return record
+
+    def snapshot(self):
+        '''
+        :return: a dictionary of method names to dictionaries of their calls, total_time, self_time and histogram.  The
+        histogram is a list of (upper bound, count) pairs, the last of which has an upper bound of None.
+        '''
+        with self._lock:
+            thread_records = [dict(records) for records in self._thread_records]
+            names = dict(self._names)
+
+        summed = dict()
+        for records in thread_records:
+            for function, record in records.items():
+                total = summed.setdefault(function, [0.0] * len(record))
+                for index, value in enumerate(record):
+                    total[index] += value
+
+        bounds = self.buckets + (None,)
+        snapshot = dict()
+
+        for function, record in summed.items():
+            snapshot[names[function]] = {
+                'calls': int(record[_CALLS]),
+                'total_time': record[_TOTAL_TIME],
+                'self_time': record[_SELF_TIME],
+                'histogram': zip(bounds, [int(count) for count in record[_HISTOGRAM:]])
+            }
+
+        return snapshot
+
+    def reset(self):
+        '''
+        Zeroes every method's figures.
+        '''
+        with self._lock:
+            for records in self._thread_records:
+                for record in records.values():
+                    for index in range(len(record)):
+                        record[index] = 0.0
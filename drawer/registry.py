@@ -0,0 +1,79 @@
+'''
+Registries of classes to the state weaving keeps for them.
+@author probablytom
+'''
+from weakref import WeakSet
+
+
+_no_entry = (None, None)
+
+
+class ClassRegistry(object):
+    '''
+    A dictionary-like registry of classes to values, which keeps neither the classes nor their values alive.
+
+    Each value is stored on its class, as a class attribute holding the class and the value, so that a value which
+    refers back to its class (as advice keyed by the class's own methods does) is collected along with it.  The
+    registry itself only keeps weak references to the classes, in order to list them.  Entries aren't inherited: a
+    subclass is only in the registry if it was added itself.
+    '''
+
+    def __init__(self, name):
+        self.attribute = '__drawer_%s__' % name
+        self._classes = WeakSet()
+
+    def __getitem__(self, clazz):
+        owner, value = getattr(clazz, self.attribute, _no_entry)
+        if owner is not clazz:
+            raise KeyError(clazz)
+        return value
+
+    def __setitem__(self, clazz, value):
+        setattr(clazz, self.attribute, (clazz, value))
+        self._classes.add(clazz)
+
+    def __delitem__(self, clazz):
+        if clazz not in self:
+            raise KeyError(clazz)
+        delattr(clazz, self.attribute)
+        self._classes.discard(clazz)
+
+    def __contains__(self, clazz):
+        return getattr(clazz, self.attribute, _no_entry)[0] is clazz
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, clazz, default=None):
+        owner, value = getattr(clazz, self.attribute, _no_entry)
+        return value if owner is clazz else default
+
+    def setdefault(self, clazz, default=None):
+        if clazz not in self:
+            self[clazz] = default
+        return self[clazz]
+
+    def pop(self, clazz, *default):
+        if clazz in self:
+            value = self[clazz]
+            del self[clazz]
+            return value
+        elif len(default) > 0:
+            return default[0]
+        raise KeyError(clazz)
+
+    def keys(self):
+        return [clazz for clazz in self._classes if clazz in self]
+
+    def values(self):
+        return [self[clazz] for clazz in self.keys()]
+
+    def items(self):
+        return [(clazz, self[clazz]) for clazz in self.keys()]
+
+    def clear(self):
+        for clazz in self.keys():
+            del self[clazz]
@@ -0,0 +1,47 @@
+'''
+An aspect for applying other aspects to only a sample of calls.
+@author probablytom
+'''
+from .weaver import IdentityAspect, _aspect_applier
+from random import random
+
+
+class SamplingAspect(IdentityAspect):
+    '''
+    Applies another aspect to a sample of the calls made to the methods it advises, calling the methods directly the
+    rest of the time.  Calls are sampled either one in every `every`, by counting, or with the given probability.
+    Both can be changed at any time by setting the attributes of the same names, without weaving again.
+    '''
+
+    def __init__(self, aspect, every=1, probability=None):
+        '''
+        :param aspect: the aspect to apply to sampled calls.
+        :param every: sample one in this many calls.  Ignored if a probability is given.
+        :param probability: the probability, between 0 and 1, that any single call is sampled.
+        '''
+        super(SamplingAspect, self).__init__()
+        self.aspect = aspect
+        self.every = every
+        self.probability = probability
+        self._unsampled_calls = 0
+
+    def around(self, attribute, context, *args, **kwargs):
+        if self.probability is None:
+            self._unsampled_calls += 1
+            if self._unsampled_calls < self.every:
+                return attribute(*args, **kwargs)
+            self._unsampled_calls = 0
+
+        elif random() >= self.probability:
+            return attribute(*args, **kwargs)
+
+        return self._apply_aspect(attribute, context, *args, **kwargs)
+
+    @property
+    def aspect(self):
+        return self._aspect
+
+    @aspect.setter
+    def aspect(self, aspect):
+        self._aspect = aspect
+        self._apply_aspect = _aspect_applier(aspect)
@@ -0,0 +1,62 @@
+'''
+An aspect observing the items generators and other iterators produce, as they're consumed.
+@author probablytom
+'''
+from .weaver import CallableAspect
+
+
+class StreamingAspect(CallableAspect):
+    '''
+    Advises methods returning generators or other iterators by wrapping what they return in a generator of its own,
+    which runs hooks as the caller consumes it: yielded() for each item, exhausted() once the iterator finishes, and
+    iteration_error() if it raises.  Nothing is buffered, so the hooks see the real iteration, however long.  Results
+    which aren't iterators, such as lists, are returned untouched.
+
+    Subclass and override the hooks.  Hooks needing state for a single iteration, such as its start time, can override
+    stream() instead, as it's called once per iteration.
+    '''
+
+    def yielded(self, attribute, context, item):
+        pass
+
+    def exhausted(self, attribute, context):
+        pass
+
+    def iteration_error(self, attribute, context, exception):
+        '''
+        Handles an exception raised while iterating.  Returning ends the iteration early, as though the iterator was
+        exhausted; by default the exception is raised to the caller.
+        '''
+        raise exception
+
+    def around(self, attribute, context, *args, **kwargs):
+        result = attribute(*args, **kwargs)
+
+        try:
+            is_iterator = iter(result) is result
+        except TypeError:
+            is_iterator = False
+
+        return self.stream(attribute, context, result) if is_iterator else result
+
+    def stream(self, attribute, context, iterator):
+        while True:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            except Exception as exception:
+                self.iteration_error(attribute, context, exception)
+                return
+
+            self.yielded(attribute, context, item)
+
+            try:
+                yield item
+            except GeneratorExit:
+                # The caller stopped early, so pass that on to the wrapped generator.
+                if hasattr(iterator, 'close'):
+                    iterator.close()
+                raise
+
+        self.exhausted(attribute, context)
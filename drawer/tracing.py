@@ -0,0 +1,187 @@
+'''
+An aspect tracing the call graph of advised methods, exportable as a Chrome trace or folded stacks.
+@author probablytom
+'''
+from .weaver import IdentityAspect, _advised_method
+from .profiling import method_name
+from .metrics import _write_rendered
+from array import array
+from collections import defaultdict
+from threading import local, Lock
+from thread import get_ident
+from timeit import default_timer
+import json
+import os
+
+
+class TracingAspect(IdentityAspect):
+    '''
+    Records a span for each call to the methods it advises, with the span of the advised call it was made from (in
+    the same thread) as its parent.  Spans are kept in a ring buffer of preallocated arrays holding the most recent
+    `capacity` of them, so tracing uses the same memory however many calls are made.
+
+    The spans in the buffer can be exported in Chrome's trace event format, for chrome://tracing or Perfetto, or as
+    folded stacks for flame graph tools.
+    '''
+
+    def __init__(self, capacity=65536, timer=default_timer):
+        '''
+        :param capacity: the number of most recent spans to keep.
+        :param timer: a function returning the current time in seconds.
+        '''
+        super(TracingAspect, self).__init__()
+        self.capacity = capacity
+        self.timer = timer
+
+        self._span_ids = array('l', [0]) * capacity
+        self._parent_ids = array('l', [0]) * capacity  # 0 for spans with no parent
+        self._name_indices = array('l', [0]) * capacity
+        self._thread_ids = array('L', [0]) * capacity
+        self._starts = array('d', [0.0]) * capacity
+        self._durations = array('d', [0.0]) * capacity
+        self._failed = array('b', [0]) * capacity
+
+        self._recorded = 0  # spans recorded, including those since overwritten
+        self._lock = Lock()
+        self._name_index_of = dict()  # functions to indices into _names
+        self._names = list()
+        self._open_spans = local()
+
+    def around(self, attribute, context, *args, **kwargs):
+        method = _advised_method(attribute)
+        function = getattr(method, 'im_func', method)
+
+        name_index = self._name_index_of.get(function)
+        if name_index is None:
+            name_index = self._add_name(method, function)
+
+        try:
+            open_spans = self._open_spans.ids
+        except AttributeError:
+            open_spans = self._open_spans.ids = []
+
+        with self._lock:
+            self._recorded += 1
+            span_id = self._recorded
+        parent_id = open_spans[-1] if open_spans else 0
+
+        open_spans.append(span_id)
+        failed = False
+        start = self.timer()
+        try:
+            return attribute(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = self.timer() - start
+            open_spans.pop()
+            self._record(span_id, parent_id, name_index, start, duration, failed)
+
+    def _add_name(self, attribute, function):
+        with self._lock:
+            if function not in self._name_index_of:
+                self._names.append(method_name(attribute))
+                self._name_index_of[function] = len(self._names) - 1
+            return self._name_index_of[function]
+
+    def _record(self, span_id, parent_id, name_index, start, duration, failed):
+        # Span ids are handed out in order, so each span's slot is only reused by one recorded capacity spans later.
+        slot = span_id % self.capacity
+        with self._lock:
+            self._span_ids[slot] = span_id
+            self._parent_ids[slot] = parent_id
+            self._name_indices[slot] = name_index
+            self._thread_ids[slot] = get_ident()
+            self._starts[slot] = start
+            self._durations[slot] = duration
+            self._failed[slot] = failed
+
+    def spans(self):
+        '''
+        :return: a list of the finished spans in the buffer, oldest first, each a dictionary of its id, parent (its
+        parent's id, or None), name, thread, start, duration and whether it failed.
+        '''
+        with self._lock:
+            first = max(1, self._recorded - self.capacity + 1)
+            slots = [span_id % self.capacity for span_id in range(first, self._recorded + 1)]
+            spans = [{
+                'id': self._span_ids[slot],
+                'parent': self._parent_ids[slot] or None,
+                'name': self._names[self._name_indices[slot]],
+                'thread': self._thread_ids[slot],
+                'start': self._starts[slot],
+                'duration': self._durations[slot],
+                'failed': bool(self._failed[slot])
+            } for slot in slots if self._span_ids[slot] >= first]
+
+        # Slots whose spans are still in progress hold older spans, or nothing, and are skipped.
+        return sorted(spans, key=lambda span: span['start'])
+
+    def render_chrome_trace(self):
+        '''
+        :return: the spans as JSON in Chrome's trace event format, with times in microseconds.
+        '''
+        process_id = os.getpid()
+        events = [{
+            'name': span['name'],
+            'ph': 'X',
+            'ts': span['start'] * 1e6,
+            'dur': span['duration'] * 1e6,
+            'pid': process_id,
+            'tid': span['thread'],
+            'args': {'id': span['id'], 'parent': span['parent'], 'failed': span['failed']}
+        } for span in self.spans()]
+
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, sort_keys=True)
+
+    def render_folded(self):
+        '''
+        :return: the spans as folded stacks: a line per distinct stack of method names, separated by semicolons, with
+        the total self time in microseconds spent at the top of that stack.  Stacks are cut short where a parent span
+        has already been overwritten in the buffer.
+        '''
+        spans = dict((span['id'], span) for span in self.spans())
+
+        child_time = defaultdict(float)
+        for span in spans.values():
+            child_time[span['parent']] += span['duration']
+
+        self_times = defaultdict(float)
+        for span in spans.values():
+            stack = [span['name']]
+            parent = spans.get(span['parent'])
+            while parent is not None:
+                stack.append(parent['name'])
+                parent = spans.get(parent['parent'])
+
+            self_times[';'.join(reversed(stack))] += span['duration'] - child_time[span['id']]
+
+        return ''.join('%s %d\n' % (stack, round(max(0.0, time) * 1e6)) for stack, time in sorted(self_times.items()))
+
+    def render(self, format='chrome'):
+        '''
+        :param format: 'chrome', for Chrome's trace event format, or 'folded', for folded stacks.
+        :return: the spans, rendered in the given format.
+        '''
+        if format == 'chrome':
+            return self.render_chrome_trace()
+        elif format == 'folded':
+            return self.render_folded()
+        raise ValueError("Unknown trace format %r; expected 'chrome' or 'folded'." % format)
+
+    def write(self, destination, format='chrome'):
+        '''
+        Writes the rendered spans to a file-like object, or atomically replaces the file at the given path with them.
+        :param destination: a path, or an object with a write method.
+        :param format: as for render.
+        '''
+        _write_rendered(destination, self.render(format))
+
+    def reset(self):
+        '''
+        Discards every span in the buffer.
+        '''
+        with self._lock:
+            for slot in range(self.capacity):
+                self._span_ids[slot] = 0
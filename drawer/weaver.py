@@ -4,15 +4,65 @@ Core weaving functionality.
 @author probablytom
 """
 import inspect
+import sys
 from functools import partial
+from threading import RLock
+from types import MethodType
+from .object_filters import FilterMatcher
+from .pointcuts import split_pointcuts, match_function, resolve_methods
+from .registry import ClassRegistry
+
+
+# The registries below are only ever changed while holding _weaving_lock, and advice_cache's tables are replaced
+# rather than changed, so the woven methods reading them on every call never need to take it.
+_weaving_lock = RLock()
+_generation = 0  # incremented whenever cached wrappers are invalidated
+
+# Classes are registered in ClassRegistries, which don't keep woven classes, their advice or their aspects alive.
+advice_cache = ClassRegistry('advice')  # classes to AdviceTables of their advice
+_reference_get_attributes = ClassRegistry('reference_get_attribute')
+_reference_attributes = ClassRegistry('reference_attributes')  # classes to the class attributes compile_clazz replaced
+_reference_module_attributes = dict()  # modules to the original functions replaced by weave_module
+_woven_attributes = ClassRegistry('woven_attributes')  # classes to the wrappers built for each of their method names
+_advised_names = ClassRegistry('advised_names')  # classes to the names of the methods their advice refers to
+_scoped_layers = ClassRegistry('scoped_layers')  # classes to what each open Weaving set for their advice and methods
+_no_entry = (None, None)
+
+
+class AdviceTable(dict):
+    '''
+    A dictionary of method reference->aspect mappings which can't be changed once built, so that it can be read
+    without locking while weaving builds a new table to replace it.
+    '''
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("AdviceTables can't be changed; weave the class again, or replace its table, instead.")
 
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
 
-advice_cache = dict()  # classes to lists of advice dicts
-_reference_get_attributes = dict()
+    def applier(self, key):
+        '''
+        :return: a function applying the advice for the supplied method reference to calls made with an explicit
+        context, as _aspect_applier builds; built once per table and key.
+        '''
+        try:
+            return self._appliers[key]
+        except AttributeError:
+            self._appliers = dict()
+        except KeyError:
+            pass
 
+        applier = self._appliers[key] = _aspect_applier(self.get(key, identity))
+        return applier
+
+
+_no_advice = AdviceTable()  # read in place of the table of a class being unwoven
 
 class IdentityAspect(object):
 
+    # Subclasses declaring __slots__ of their own do without an instance dictionary, but can still be weakly referenced.
+    __slots__ = ('__weakref__',)
+
     def prelude(self, attribute, context, *args, **kwargs):
         pass
 
@@ -36,37 +86,64 @@ class IdentityAspect(object):
         return attribute(*args, **kwargs)
 
 
+class PreludeAspect(IdentityAspect):
+    '''
+    An aspect running a function as a prelude.  The prelude decorator builds these.
+    '''
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def prelude(self, attribute, context, *args, **kwargs):
+        return self.function(attribute, context, *args, **kwargs)
+
+
+class EncoreAspect(IdentityAspect):
+    '''
+    An aspect running a function as an encore.  The encore decorator builds these.
+    '''
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def encore(self, attribute, context, result):
+        return self.function(attribute, context, result)
+
+
+class ErrorHandlerAspect(IdentityAspect):
+    '''
+    An aspect running a function as an error handler.  The error_handler decorator builds these.
+    '''
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def error_handling(self, attribute, context, exception):
+        self.function(attribute, context, exception)
+
+
 def prelude(func):
     '''
     A decorator which turns the target function into advice to run it as a prelude to something else.
     '''
-    class AutoGeneratedAdvice(IdentityAspect):
-        def prelude(self, attribute, context, *args, **kwargs):
-            return func(attribute, context, *args, **kwargs)
-
-    return AutoGeneratedAdvice()
+    return PreludeAspect(func)
 
 
 def encore(func):
     '''
     A decorator which turns the target function into advice to run it as an encore to something else.
     '''
-    class AutoGeneratedAdvice(IdentityAspect):
-        def encore(self, attribute, context, result):
-            return func(attribute, context, result)
-
-    return AutoGeneratedAdvice()
+    return EncoreAspect(func)
 
 
 def error_handler(func):
     '''
     A decorator which turns the target function into advice to run it as an error handler for something else.
     '''
-    class AutoGeneratedAdvice(IdentityAspect):
-        def error_handling(self, attribute, context, exception):
-            func(attribute, context, exception)
-
-    return AutoGeneratedAdvice()
+    return ErrorHandlerAspect(func)
 
 def requires_self_provided_in_args(func):
     '''
@@ -81,31 +158,329 @@ def requires_self_provided_in_args(func):
 
     return getattr(func, "__self__", None) is None or inspect.isfunction(func)
 
+class CallableAspect(IdentityAspect):
+    '''
+    An aspect whose around hook can also be used on its own, as a callable around() function in standard form.
+    '''
+    __slots__ = ()
+
+    def __call__(self, attribute, context, *args, **kwargs):
+        return self.around(attribute, context, *args, **kwargs)
+
+
+class AroundAspect(CallableAspect):
+    '''
+    An aspect running a prelude and an encore function around advised methods, from a single around hook.
+    generate_around_advice builds these.
+    '''
+    __slots__ = ('prelude_function', 'encore_function')
+
+    def __init__(self, prelude_function, encore_function):
+        self.prelude_function = prelude_function
+        self.encore_function = encore_function
+
+    def around(self, attribute, context, *args, **kwargs):
+        self.prelude_function(attribute, context, *args, **kwargs)
+
+        # Check whether we need to supply `self`, which for an unbound method would be what we've got as `context`.
+        if requires_self_provided_in_args(attribute):
+            args = (context,) + args
+
+        result = attribute(*args, **kwargs)
+
+        self.encore_function(attribute, context, result)
+
+        return result
+
+
 def generate_around_advice(prelude, encore):
+    return AroundAspect(prelude, encore)
+
+
+identity = IdentityAspect()
+
+
+def _advised_method(attribute):
+    '''
+    :return: the advised method an around hook's attribute runs.  Chains of arounds pass partials of the next around,
+    with the method nested inside, which are built afresh for every call; these are unwrapped to reach the method.
+    '''
+    while isinstance(attribute, partial):
+        attribute = attribute.args[0] if len(attribute.args) > 0 else attribute.func
+    return attribute
+
+
+def _hooks_of(aspect):
+    '''
+    Finds the hooks an aspect really implements.  Hooks which are missing, or inherited unchanged from IdentityAspect,
+    behave as though the aspect wasn't there and so are reported as None.
+    :return: the aspect's prelude, around, encore and error_handling hooks as bound methods, or None.
+    '''
+    hooks = list()
+    for name in ('prelude', 'around', 'encore', 'error_handling'):
+        hook = getattr(aspect, name, None)
+        if getattr(hook, 'im_func', None) is getattr(IdentityAspect, name).im_func:
+            hook = None
+        hooks.append(hook)
+    return hooks
+
+
+def asynchronous(func):
+    '''
+    A decorator marking a method as asynchronous: one which returns a future (anything with add_done_callback, such as
+    a concurrent.futures or Tornado Future) for its result.  When such a method is woven, encores and error handlers
+    are run once the future completes, against its result or exception, and callers are handed a future for the
+    advised result instead.  Tornado coroutines are recognised as asynchronous without being marked.
+    '''
+    func.__asynchronous__ = True
+    return func
+
+
+def _is_asynchronous(function):
+    return getattr(function, '__asynchronous__', False) or getattr(function, '__tornado_coroutine__', False)
+
+
+def _complete_advised(future, attribute, context, encore, error_handling):
+    '''
+    :return: a future, of the same type as the supplied one, for the result of running the encore and error handler
+    against the supplied future's outcome.
+    '''
+    advised_future = type(future)()
 
-    class AutoGeneratedAdvice(IdentityAspect):
+    def complete(future):
+        try:
+            result = future.result()
+            if encore is not None:
+                encore(attribute, context, result)
 
-        def around(self, attribute, context, *args, **kwargs):
-            prelude(attribute, context, *args, **kwargs)
+        except Exception as exception:
+            if error_handling is None:
+                advised_future.set_exception(exception)
+                return
 
-            # Check whether we need to supply `self`, which for an unbound method would be what we've got as `context`.
-            if requires_self_provided_in_args(attribute):
-                args = (context,) + args
+            try:
+                result = error_handling(attribute, context, exception)
+            except Exception as handler_exception:
+                advised_future.set_exception(handler_exception)
+                return
 
+        advised_future.set_result(result)
+
+    future.add_done_callback(complete)
+    return advised_future
+
+
+def _asynchronous_dispatcher(prelude, around, encore, error_handling):
+
+    def dispatch_asynchronous(attribute, *args, **kwargs):
+        context = attribute.__self__
+        try:
+            if prelude is not None:
+                prelude(attribute, context, *args, **kwargs)
+
+            if around is not None:
+                result = around(attribute, context, *args, **kwargs)
+            else:
+                result = attribute(*args, **kwargs)
+
+            if hasattr(result, 'add_done_callback'):
+                return _complete_advised(result, attribute, context, encore, error_handling)
+
+            if encore is not None:
+                encore(attribute, context, result)
+
+            return result
+
+        # Exceptions raised before a future is returned are handled as they would be for any other method.
+        except Exception as exception:
+            if error_handling is not None:
+                return error_handling(attribute, context, exception)
+            else:
+                raise
+
+    return dispatch_asynchronous
+
+
+def _filtering_dispatcher(filters, is_asynchronous):
+    '''
+    Builds a dispatching function for a dictionary of object filter->aspect mappings, which applies the aspect of the
+    filter matching the object each call is made on.  Methods called on objects no filter matches run unadvised.
+    '''
+    matcher = FilterMatcher(dict((object_filter, _dispatcher(aspect, is_asynchronous))
+                                 for object_filter, aspect in filters.items()))
+
+    def dispatch_filtered(attribute, *args, **kwargs):
+        dispatch = matcher.match(attribute.__self__)
+        if dispatch is None:
+            return attribute(*args, **kwargs)
+        return dispatch(attribute, *args, **kwargs)
+
+    return dispatch_filtered
+
+
+def _dispatcher(aspect, is_asynchronous=False):
+    '''
+    Builds a function applying the supplied aspect to a call of a bound method, specialised to the hooks the aspect
+    implements so that no time is spent on checking for, or running, hooks which do nothing.  The returned function
+    takes the bound method followed by its arguments; the object the method is bound to is the context for the hooks.
+    :param is_asynchronous: whether the method returns a future, whose outcome the encore and error handler apply to.
+    :return: the dispatching function, or None if the aspect implements no hooks at all.
+    '''
+    if isinstance(aspect, dict):
+        return _filtering_dispatcher(aspect, is_asynchronous)
+
+    prelude, around, encore, error_handling = _hooks_of(aspect)
+
+    if is_asynchronous and (encore is not None or error_handling is not None):
+        return _asynchronous_dispatcher(prelude, around, encore, error_handling)
+
+    if around is None and encore is None and error_handling is None:
+        if prelude is None:
+            return None
+
+        def dispatch_prelude(attribute, *args, **kwargs):
+            prelude(attribute, attribute.__self__, *args, **kwargs)
+            return attribute(*args, **kwargs)
+
+        return dispatch_prelude
+
+    if prelude is None and around is None and error_handling is None:
+
+        def dispatch_encore(attribute, *args, **kwargs):
             result = attribute(*args, **kwargs)
+            encore(attribute, attribute.__self__, result)
+            return result
+
+        return dispatch_encore
+
+    if prelude is None and encore is None and error_handling is None:
+
+        def dispatch_around(attribute, *args, **kwargs):
+            return around(attribute, attribute.__self__, *args, **kwargs)
+
+        return dispatch_around
+
+    if prelude is None and around is None and encore is None:
+
+        def dispatch_error_handling(attribute, *args, **kwargs):
+            try:
+                return attribute(*args, **kwargs)
+            except Exception as exception:
+                return error_handling(attribute, attribute.__self__, exception)
 
-            encore(attribute, context, result)
+        return dispatch_error_handling
+
+    def dispatch(attribute, *args, **kwargs):
+        context = attribute.__self__
+        try:
+            if prelude is not None:
+                prelude(attribute, context, *args, **kwargs)
+
+            if around is not None:
+                result = around(attribute, context, *args, **kwargs)
+            else:
+                result = attribute(*args, **kwargs)
+
+            if encore is not None:
+                encore(attribute, context, result)
 
             return result
 
-        # So this can also be treated as a callable around() function in standard form.
-        def __call__(self, attribute, context, *args, **kwargs):
-            return self.around(attribute, context, *args, **kwargs)
+        except Exception as exception:
+            if error_handling is not None:
+                return error_handling(attribute, context, exception)
+            else:
+                raise
 
-    return AutoGeneratedAdvice()
+    return dispatch
 
 
-identity = IdentityAspect()
+def _weave_method(clazz, item, attribute):
+    '''
+    Builds and caches the wrapper handed out by a woven __getattribute__ for a method bound to the object being
+    accessed.  The advice for the method is resolved once, here, and the wrapper is bound to each bound method it wraps
+    rather than closing over it, so one wrapper serves every instance of the method's class.  Returns None for
+    unadvised methods.
+    '''
+    generation = _generation
+    wrap = _build_method_wrapper(clazz, attribute)
+
+    # Don't cache wrappers built from advice which was replaced while they were being built.
+    with _weaving_lock:
+        if generation == _generation:
+            _woven_attributes.setdefault(attribute.im_class, dict())[item] = wrap
+
+    return wrap
+
+
+def _build_method_wrapper(clazz, attribute):
+    function = attribute.im_func
+
+    # Ensure that advice key is unbound method for instance methods.
+    advice_key = getattr(attribute.im_class, function.func_name)
+    wrap = _dispatcher(advice_cache.get(clazz, _no_advice).get(advice_key, identity), _is_asynchronous(function))
+
+    # Methods inherited or overridden under an advised name may not be advised themselves.
+    if wrap is None:
+        return None
+
+    wrap.func_name = function.func_name
+    wrap.func_dict = function.func_dict  # Preserves any attribute changes to the method / function
+
+    return wrap
+
+
+def _names_of(advice):
+    names = [getattr(target, '__name__', None) for target in advice]
+    return frozenset(name for name in names if name is not None and name[0:2] != '__')
+
+
+def _hierarchy_of(clazz):
+    '''
+    :return: the supplied class and all of its subclasses.
+    '''
+    hierarchy = [clazz]
+    for subclazz in hierarchy:
+        hierarchy.extend(subclass for subclass in type.__subclasses__(subclazz) if subclass not in hierarchy)
+    return hierarchy
+
+
+def invalidate_wrapper_cache(clazz=None):
+    '''
+    Discards the wrappers woven classes have cached for their methods and re-indexes the method names they advise, so
+    that both are rebuilt from advice_cache.  Weaving and unweaving do this automatically; call it after replacing a
+    table in advice_cache directly.
+    :param clazz: the class whose wrappers (and whose subclasses' wrappers) should be discarded, or None for all.
+    '''
+    global _generation
+
+    with _weaving_lock:
+        _generation += 1
+
+        for woven_clazz in list(advice_cache) if clazz is None else [clazz]:
+            if woven_clazz in advice_cache:
+                _advised_names[woven_clazz] = _names_of(advice_cache[woven_clazz])
+            else:
+                _advised_names.pop(woven_clazz, None)
+
+        if clazz is None:
+            _woven_attributes.clear()
+        else:
+            for woven_clazz in _hierarchy_of(clazz):
+                _woven_attributes.pop(woven_clazz, None)
+
+
+def _resolve_pointcuts(clazz, advice):
+    '''
+    :return: the supplied advice with any Pointcut keys replaced by the methods of the class they match.
+    '''
+    pointcuts, advice = split_pointcuts(advice)
+    if len(pointcuts) == 0:
+        return advice
+
+    resolved = resolve_methods(pointcuts, clazz)
+    resolved.update(advice)
+    return resolved
 
 
 def weave_clazz(clazz, advice):
@@ -117,102 +492,527 @@ def weave_clazz(clazz, advice):
     dictionary (which maps method references to aspects) before returning it to the requester.
 
     An aspect value may itself be a dictionary of object filter->aspect mappings.  In this case, the dictionary is
-    searched for a filter that matches the target (self) object specified in the __getattribute__ call.
+    searched for a filter that matches the target (self) object specified in the __getattribute__ call.  Filters may
+    be AttributeFilters, classes or predicates; see FilterMatcher for how they are matched.
+
+    Advice keys may also be Pointcuts, which are resolved to the class's matching methods here, once.  Advice for a
+    method reference takes precedence over pointcuts matching the same method.
+
+    Weaving can safely happen while other threads call the class's methods: the class's advice is replaced with a new
+    AdviceTable, never changed in place.
 
     :param clazz : the class to weave.
     :param advice : the dictionary of method reference->aspect mappings to apply for the class.
     """
 
-    if clazz not in _reference_get_attributes:
-        _reference_get_attributes[clazz] = clazz.__getattribute__
+    weave_many({clazz: advice})
 
-    if clazz in advice_cache:
-        advice_cache[clazz].update(advice)
-    else:
-        advice_cache[clazz] = advice
+
+def weave_many(advice_by_class):
+    """
+    Weaves many classes at once, as weave_clazz would weave each of them, taking the weaving lock once.  Each class's
+    __getattribute__ is only replaced if it isn't already woven.
+    :param advice_by_class: a dictionary of classes to dictionaries of the advice to apply for them.
+    """
+    resolved = [(clazz, _resolve_pointcuts(clazz, advice)) for clazz, advice in advice_by_class.items()]
+
+    with _weaving_lock:
+        for clazz, advice in resolved:
+            if clazz not in _reference_get_attributes:
+                _reference_get_attributes[clazz] = clazz.__getattribute__
+
+            table = dict(advice_cache.get(clazz, ()))
+            table.update(advice)
+            advice_cache[clazz] = AdviceTable(table)
+
+            invalidate_wrapper_cache(clazz)
+
+            # Unweaving a subclass can leave its superclass's woven __getattribute__ in its own dictionary.
+            installed = vars(clazz).get('__getattribute__')
+            if getattr(installed, 'woven_class', None) is not clazz:
+                clazz.__getattribute__ = _woven_getattribute(clazz)
+
+
+def _woven_getattribute(clazz):
+    '''
+    :return: a __getattribute__ for the supplied class, applying the advice in advice_cache for it.
+    '''
+    advised_names_attribute = _advised_names.attribute
+    woven_attributes_attribute = _woven_attributes.attribute
 
     def __weaved_getattribute__(self, item):
         attribute = object.__getattribute__(self, item)
 
-        if item[0:2] == '__':
+        # Names which no advice refers to are never wrapped.  The registries are read directly here, for speed.
+        owner, advised_names = getattr(clazz, advised_names_attribute, _no_entry)
+        if owner is not clazz or item not in advised_names:
             return attribute
 
+        if getattr(attribute, '__self__', None) is self:
+            owner, wrappers = getattr(type(self), woven_attributes_attribute, _no_entry)
+            if owner is type(self) and item in wrappers:
+                wrap = wrappers[item]
+            else:
+                wrap = _weave_method(clazz, item, attribute)
+
+            return attribute if wrap is None else MethodType(wrap, attribute)
+
         elif inspect.isfunction(attribute) or inspect.ismethod(attribute):
 
+            # Functions held by the object itself and methods bound to something else can't be shared between
+            # instances, so these are wrapped afresh each time.
             def wrap(*args, **kwargs):
+                advice_key = attribute
+                if inspect.ismethod(attribute):
+                    advice_key = getattr(attribute.im_class, attribute.func_name, attribute)
 
-                advice = advice_cache[clazz]  # In case we've recieved _multiple_ pieces of advice
+                return advice_cache.get(clazz, _no_advice).applier(advice_key)(attribute, self, *args, **kwargs)
 
-                # Sensible defaults for a function.
-                reference_function = attribute
-                advice_key = reference_function
+            wrap.func_name = attribute.func_name
+            wrap.func_dict = attribute.func_dict  # Preserves any attribute changes to the method / function
 
-                # If we're working with a method, we need to be clever about these values.
-                if inspect.ismethod(attribute):
-                    reference_function = attribute.im_func
+            return wrap
 
-                    # Ensure that advice key is unbound method for instance methods.
-                    advice_key = getattr(attribute.im_class, attribute.func_name)
+        else:
+            return attribute
 
-                # Retrieve our aspect
-                aspect = advice.get(advice_key, identity)
+    __weaved_getattribute__.woven_class = clazz
+    return __weaved_getattribute__
 
-                # Run our function
-                try:
-                    if hasattr(aspect, 'prelude'):
-                        aspect.prelude(attribute, self, *args, **kwargs)
 
-                    if hasattr(aspect, 'around'):
-                        result = aspect.around(attribute, self, *args, **kwargs)
-                    else:
+def _aspect_applier(aspect):
+    '''
+    Builds a function applying the supplied aspect to a call of any callable, taking the callable, the context for the
+    aspect's hooks and then the call's arguments.  For a dictionary of object filter->aspect mappings, the filters are
+    indexed here, once, rather than on every call.
+    '''
+    if not isinstance(aspect, dict):
+        return partial(_apply_aspect, aspect)
 
-                        # If we're on an unbound method, supply `self` as the first parameter.
-                        func_args = args
-                        if inspect.ismethod(attribute):
-                            func_args = (self,) + args
+    matcher = FilterMatcher(dict((object_filter, _aspect_applier(filtered_aspect))
+                                 for object_filter, filtered_aspect in aspect.items()))
 
-                        result = reference_function(*func_args, **kwargs)
+    def apply_filtered(attribute, context, *args, **kwargs):
+        apply_aspect = matcher.match(context)
+        if apply_aspect is None:
+            return attribute(*args, **kwargs)
+        return apply_aspect(attribute, context, *args, **kwargs)
 
-                    if hasattr(aspect, 'encore'):
-                        aspect.encore(attribute, self, result)
+    return apply_filtered
 
-                    return result
 
-                # If exceptions are raised, handle with the error handler.
-                except Exception as exception:
-                    if hasattr(aspect, 'error_handling'):
-                        return aspect.error_handling(attribute, self, exception)
-                    else:
-                        raise exception
+def _apply_aspect(aspect, attribute, context, *args, **kwargs):
+    try:
+        if hasattr(aspect, 'prelude'):
+            aspect.prelude(attribute, context, *args, **kwargs)
 
-            wrap.func_name = attribute.func_name
-            wrap.func_dict = attribute.func_dict  # Preserves any attribute changes to the method / function
+        if hasattr(aspect, 'around'):
+            result = aspect.around(attribute, context, *args, **kwargs)
+        else:
+            result = attribute(*args, **kwargs)
 
-            return wrap
+        if hasattr(aspect, 'encore'):
+            aspect.encore(attribute, context, result)
 
+        return result
+
+    except Exception as exception:
+        if hasattr(aspect, 'error_handling'):
+            return aspect.error_handling(attribute, context, exception)
         else:
-            return attribute
+            raise
+
+
+def _compile_method(function, aspect):
+    dispatch = _dispatcher(aspect, _is_asynchronous(function))
+
+    if dispatch is None:
+        return function
+
+    def compiled(self, *args, **kwargs):
+        return dispatch(MethodType(function, self, type(self)), *args, **kwargs)
 
-    clazz.__getattribute__ = __weaved_getattribute__
+    compiled.func_name = function.func_name
+    compiled.func_dict = function.func_dict  # Preserves any attribute changes to the method / function
+    compiled.__doc__ = function.__doc__
 
+    return compiled
 
-def weave_module(mod, advice):
+
+def _class_attribute(clazz, name):
+    '''
+    :return: the raw value a class holds, or inherits, under the supplied name, before any descriptor is applied.
+    '''
+    for klass in inspect.getmro(clazz):
+        if name in vars(klass):
+            return vars(klass)[name]
+    return None
+
+
+def compile_clazz(clazz, advice):
+    """
+    Applies aspects specified in the supplied advice dictionary to methods in the supplied class by rewriting the
+    advised methods on the class itself.
+
+    Unlike weave_clazz, __getattribute__ is left untouched, so reading fields or calling unadvised methods on instances
+    of the class costs nothing extra.  Only the methods named in the advice dictionary are replaced, each with a
+    wrapper that applies its aspect before delegating to the original function.  Compiling the same method again
+    replaces the previous aspect rather than stacking on top of it.
+
+    :param clazz : the class to weave.
+    :param advice : the dictionary of method reference->aspect mappings, or Pointcut->aspect mappings, to apply.
     """
-    Weaves specified advice in the supplied dictionary to methods in the supplied module.  All member classes and
-    functions are inspected in turn, with the specified advice being applied to each.
+
+    advice = _resolve_pointcuts(clazz, advice)
+
+    with _weaving_lock:
+        originals = _reference_attributes.setdefault(clazz, dict())
+
+        for target, aspect in advice.items():
+            name = getattr(target, '__name__', None)
+
+            if name is None or name[0:2] == '__' or not hasattr(clazz, name):
+                continue
+
+            # Class and static methods are left alone: replacing them with a plain function would change how they bind.
+            if not inspect.isfunction(_class_attribute(clazz, name)):
+                continue
+
+            current = getattr(getattr(clazz, name), 'im_func', None)
+            original = originals[name][1] if name in originals else current
+
+            # Only advise methods which actually belong to this class, inherited or otherwise.
+            if not inspect.isfunction(original) or getattr(target, 'im_func', target) not in (original, current):
+                continue
+
+            # Remember what the class held itself (None if inherited) alongside the function being wrapped.
+            originals.setdefault(name, (clazz.__dict__.get(name), original))
+
+            setattr(clazz, name, _compile_method(original, aspect))
+
+        invalidate_wrapper_cache(clazz)
+
+
+def _compile_function(function, aspect, context):
+    apply_aspect = _aspect_applier(aspect)
+
+    def compiled(*args, **kwargs):
+        return apply_aspect(function, context, *args, **kwargs)
+
+    compiled.func_name = function.func_name
+    compiled.func_dict = function.func_dict  # Preserves any attribute changes to the method / function
+    compiled.__doc__ = function.__doc__
+
+    return compiled
+
+
+def _weave_function(mod, function, aspect):
+    '''
+    Replaces the supplied function in the module it's defined in with a wrapper applying the supplied aspect.
+    :return: whether the function was found in the module, and so woven.
+    '''
+    with _weaving_lock:
+        name = function.__name__
+        originals = _reference_module_attributes.get(mod, dict())
+
+        if getattr(mod, name, None) is not function and originals.get(name) is not function:
+            return False
+
+        _reference_module_attributes.setdefault(mod, originals).setdefault(name, function)
+        setattr(mod, name, _compile_function(function, aspect, mod))
+        return True
+
+
+def weave_module(mod, advice, recursive=False):
+    """
+    Weaves specified advice in the supplied dictionary to the methods and functions it refers to in the supplied
+    module.  Classes with advised methods are each woven once, with the advice for their own methods.  Advised
+    module-level functions are replaced with wrappers applying their aspects, taking the module as their context.
+
+    Only the advice is searched, not the module, so weaving costs time in proportion to what is advised.  Advice for
+    anything defined in another module is ignored, so classes and functions the module imports are left alone.  Advice
+    for functions which belong to neither a class nor the module (such as static methods) is applied to every class
+    defined in the module.
+
+    Pointcut keys are resolved once, here, against the methods of every class defined in the module and the functions
+    it defines, so unlike other advice they search the module.
     :param mod : the module to weave.
     :param advice : the dictionary of method->aspect mappings to apply.
+    :param recursive : whether to also weave advice for the module's submodules.
     """
-    for _, member in inspect.getmembers(mod):
-        if inspect.isclass(member):
-            weave_clazz(member, advice)
+
+    def defined_here(module_name):
+        return module_name == mod.__name__ or \
+            (recursive and module_name is not None and module_name.startswith(mod.__name__ + '.'))
+
+    def modules():
+        found = [mod]
+        if recursive:
+            found.extend(module for name, module in sys.modules.items()
+                         if module is not None and name.startswith(mod.__name__ + '.'))
+        return found
+
+    def defined_classes(module):
+        return [member for member in vars(module).values()
+                if inspect.isclass(member) and member.__module__ == module.__name__]
+
+    class_advice = dict()
+    unowned_advice = dict()
+    pointcuts, advice = split_pointcuts(advice)
+
+    if len(pointcuts) > 0:
+        advice = dict(advice)
+        for module in modules():
+            for clazz in defined_classes(module):
+                class_advice[clazz] = resolve_methods(pointcuts, clazz)
+
+            for name, member in vars(module).items():
+                if inspect.isfunction(member) and member.__module__ == module.__name__:
+                    aspect = match_function(pointcuts, None, name, member)
+                    if aspect is not None:
+                        advice.setdefault(member, aspect)
+
+    for target, aspect in advice.items():
+        clazz = getattr(target, 'im_class', None)
+
+        if clazz is not None:
+            if defined_here(clazz.__module__):
+                class_advice.setdefault(clazz, dict())[target] = aspect
+
+        elif inspect.isfunction(target) and defined_here(target.__module__):
+            owner = mod if target.__module__ == mod.__name__ else sys.modules.get(target.__module__)
+            if owner is None or not _weave_function(owner, target, aspect):
+                unowned_advice[target] = aspect
+
+    if len(unowned_advice) > 0:
+        for module in modules():
+            for clazz in defined_classes(module):
+                class_advice.setdefault(clazz, dict()).update(unowned_advice)
+
+    for clazz, advice_for_clazz in class_advice.items():
+
+        # A woven class's own __getattribute__ only consults its own advice, so it takes on its bases' advice too.
+        inherited_advice = dict()
+        for base in reversed(inspect.getmro(clazz)[1:]):
+            inherited_advice.update(class_advice.get(base, ()))
+        inherited_advice.update(advice_for_clazz)
+
+        if len(inherited_advice) > 0:
+            weave_clazz(clazz, inherited_advice)
+
+
+def unweave_module(mod):
+    with _weaving_lock:
+        for name, original in _reference_module_attributes.pop(mod, dict()).items():
+            setattr(mod, name, original)
+
+
+def _restore_get_attribute(clazz):
+    '''
+    Puts back the __getattribute__ a class had before it was woven, removing it from the class's own dictionary if it
+    was only inherited.
+    '''
+    if clazz not in _reference_get_attributes:
+        return
+
+    reference = _reference_get_attributes.pop(clazz)
+    inherited = next(vars(klass)['__getattribute__'] for klass in inspect.getmro(clazz)[1:]
+                     if '__getattribute__' in vars(klass))
+
+    if getattr(reference, 'im_func', reference) is inherited:
+        del clazz.__getattribute__
+    else:
+        clazz.__getattribute__ = reference
 
 
 def unweave_class(clazz):
-    if clazz in _reference_get_attributes:
-        clazz.__getattribute__ = _reference_get_attributes[clazz]
+    '''
+    Removes all weaving from the supplied class, forgetting its advice, so that weaving it again starts afresh.
+    '''
+    with _weaving_lock:
+        # Stop woven methods consulting the advice before it's dropped, so none find their class's table missing.
+        _restore_get_attribute(clazz)
+        _advised_names.pop(clazz, None)
+        advice_cache.pop(clazz, None)
+        _scoped_layers.pop(clazz, None)
+
+        for name, (original, _) in _reference_attributes.pop(clazz, dict()).items():
+            if original is None:
+                delattr(clazz, name)
+            else:
+                setattr(clazz, name, original)
+
+        invalidate_wrapper_cache(clazz)
 
 
 def unweave_all_classes():
-    for clazz in _reference_get_attributes.keys():
+    for clazz in set(_reference_get_attributes.keys()) | set(_reference_attributes.keys()):
         unweave_class(clazz)
+
+
+_absent = object()
+
+
+def _scoped_value(clazz, slot):
+    kind, key = slot
+    if kind == 'advice':
+        return advice_cache.get(clazz, _no_advice).get(key, _absent)
+    return clazz.__dict__.get(key, _absent)
+
+
+def _set_scoped_value(clazz, slot, value):
+    kind, key = slot
+    if kind == 'attribute':
+        _restore_attribute(clazz, key, value)
+        return
+
+    table = dict(advice_cache.get(clazz, ()))
+    if value is _absent:
+        table.pop(key, None)
+    else:
+        table[key] = value
+
+    if len(table) > 0:
+        advice_cache[clazz] = AdviceTable(table)
+        return
+
+    # With no advice left, the class is unwoven, in the same order as unweave_class.
+    _restore_get_attribute(clazz)
+    _advised_names.pop(clazz, None)
+    advice_cache.pop(clazz, None)
+
+
+def _forget_restored_originals(clazz, layers):
+    '''
+    Drops compile_clazz's record of attributes which scoped undo has put back as they were before any compiling.
+    '''
+    originals = _reference_attributes.get(clazz)
+    if originals is None:
+        return
+
+    for name, (original, _) in list(originals.items()):
+        if ('attribute', name) not in layers and clazz.__dict__.get(name) is original:
+            del originals[name]
+
+    if len(originals) == 0:
+        _reference_attributes.pop(clazz, None)
+
+
+def _restore_attribute(clazz, name, value):
+    if value is not _absent:
+        setattr(clazz, name, value)
+    elif name in clazz.__dict__:
+        delattr(clazz, name)
+
+
+class Weaving(object):
+    '''
+    Weaves classes, recording what each weave changed so that it can be undone later.  Undoing removes only the advice
+    and compiled methods this Weaving added, so Weavings can be undone in any order: where another Weaving has since
+    replaced the same advice, that advice stays and will fall back to what was there before both.  Undoing takes time
+    in proportion to what was woven through this Weaving rather than to everything woven so far.  A Weaving is a
+    context manager which undoes its weaving on exit; see weaving().
+    '''
+
+    def __init__(self):
+        self._records = list()  # (class, slot, [installed value, value underneath]) for everything this Weaving set
+
+    def _record(self, clazz, slot, installed, previous):
+        record = [installed, previous]
+        _scoped_layers.setdefault(clazz, dict()).setdefault(slot, list()).append(record)
+        self._records.append((clazz, slot, record))
+
+    def weave_clazz(self, clazz, advice):
+        '''
+        Weaves the supplied class as weave_clazz does, recording how to undo it.
+        :return: this Weaving.
+        '''
+        advice = _resolve_pointcuts(clazz, advice)
+
+        with _weaving_lock:
+            before = advice_cache.get(clazz, _no_advice)
+            weave_clazz(clazz, advice)
+            after = advice_cache[clazz]
+
+            for key in advice:
+                self._record(clazz, ('advice', key), after[key], before.get(key, _absent))
+        return self
+
+    def compile_clazz(self, clazz, advice):
+        '''
+        Weaves the supplied class as compile_clazz does, recording how to undo it.
+        :return: this Weaving.
+        '''
+        advice = _resolve_pointcuts(clazz, advice)
+
+        with _weaving_lock:
+            names = set(getattr(target, '__name__', None) for target in advice) - {None}
+            before = dict((name, clazz.__dict__.get(name, _absent)) for name in names)
+            compile_clazz(clazz, advice)
+
+            for name, previous in before.items():
+                installed = clazz.__dict__.get(name, _absent)
+                if installed is not previous:
+                    self._record(clazz, ('attribute', name), installed, previous)
+        return self
+
+    def unweave(self):
+        '''
+        Undoes all of the weaving done through this Weaving, most recent first.
+        '''
+        with _weaving_lock:
+            unwoven = list()
+
+            while len(self._records) > 0:
+                clazz, slot, record = self._records.pop()
+                layers = _scoped_layers.get(clazz, dict())
+                stack = layers.get(slot, ())
+                positions = [position for position, layer in enumerate(stack) if layer is record]
+
+                # Forgotten when the class was unwoven outright.
+                if len(positions) == 0:
+                    continue
+
+                del stack[positions[0]]
+                if positions[0] < len(stack):
+                    # A later Weaving's layer is on top, so it falls back to what this one fell back to.
+                    stack[positions[0]][1] = record[1]
+                elif _scoped_value(clazz, slot) is record[0]:
+                    _set_scoped_value(clazz, slot, record[1])
+
+                if len(stack) == 0:
+                    del layers[slot]
+                if clazz not in unwoven:
+                    unwoven.append(clazz)
+
+            for clazz in unwoven:
+                layers = _scoped_layers.get(clazz, dict())
+                _forget_restored_originals(clazz, layers)
+                if len(layers) == 0:
+                    _scoped_layers.pop(clazz, None)
+                invalidate_wrapper_cache(clazz)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.unweave()
+
+
+def weaving(clazz=None, advice=None):
+    '''
+    Creates a Weaving, optionally weaving the supplied class with the supplied advice straight away.  Use it as a
+    context manager to have the weaving undone at the end of a block:
+
+        with weaving(Target, {Target.foo: aspect}) as woven:
+            woven.weave_clazz(Other, {Other.bar: aspect})
+            ...
+
+    :param clazz : a class to weave immediately.
+    :param advice : the dictionary of method reference->aspect mappings to apply for the class.
+    :return: the Weaving.
+    '''
+    woven = Weaving()
+    if clazz is not None:
+        woven.weave_clazz(clazz, advice)
+    return woven
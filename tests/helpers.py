@@ -0,0 +1,46 @@
+'''
+Stand-ins shared between the test modules.
+@author probablytom
+'''
+from threading import Event
+
+
+class Future(object):
+    '''
+    Just enough of a future to stand in for concurrent.futures' when testing asynchronous advice.
+    '''
+    def __init__(self):
+        self.callbacks = []
+        self.outcome = None
+        self.done = Event()
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def set_result(self, result):
+        self.outcome = (result, None)
+        self.done.set()
+        [callback(self) for callback in self.callbacks]
+
+    def set_exception(self, exception):
+        self.outcome = (None, exception)
+        self.done.set()
+        [callback(self) for callback in self.callbacks]
+
+    def result(self):
+        if self.outcome[1] is not None:
+            raise self.outcome[1]
+        return self.outcome[0]
+
+
+class FakeTimer(object):
+    '''
+    A timer whose time only moves when a test sets `now`, or by `step` each time it's read.
+    '''
+    def __init__(self, step=0.0):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
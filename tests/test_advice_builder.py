@@ -1,5 +1,5 @@
 import unittest
-from drawer import AdviceBuilder, generate_around_advice, IdentityAspect
+from drawer import AdviceBuilder, generate_around_advice, IdentityAspect, FrozenAdvice, advice_cache
 
 class Target(object):
     def __init__(self):
@@ -175,3 +175,62 @@ class TestAdviceBuilder(unittest.TestCase):
         self.assertEqual(target.count, 1+1)
         self.assertEqual(target.exceptions_handled, 1)
 
+    def test_advice_builder_changes_after_apply(self):
+        builder = AdviceBuilder()
+        builder.add_prelude(Target.increment_count, increment_count)
+        builder.apply()
+
+        target = Target()
+        target.increment_count()
+        builder.add_encore(Target.increment_count, increment_count)
+        target.increment_count()
+
+        self.assertEqual(target.count, (1+1) + (1+1+1))  # The encore should apply without applying the builder again.
+
+    def test_advice_builder_weaves_each_class_once(self):
+        class BatchTarget(Target):
+            pass
+
+        builder = AdviceBuilder()
+        builder.add_prelude(BatchTarget.increment_count, increment_count)
+        builder.add_error_handler(BatchTarget.raise_exception, handle_exception)
+        builder.add_encore(BatchTarget.noop, increment_count)
+        builder.apply()
+
+        self.assertEqual(sorted(target.__name__ for target in advice_cache[BatchTarget]),
+                         ['increment_count', 'noop', 'raise_exception'])
+
+        target = BatchTarget()
+        target.increment_count()
+        target.noop()
+        target.raise_exception()
+        self.assertEqual((target.count, target.exceptions_handled), (1+1+1, 1))
+
+    def test_advice_builder_frozen_apply(self):
+        class FrozenTarget(Target):
+            pass
+
+        builder = AdviceBuilder()
+        builder.add_prelude(FrozenTarget.increment_count, increment_count)
+        builder.add_prelude(FrozenTarget.increment_count, increment_count)
+        builder.add_error_handler(FrozenTarget.raise_exception, handle_exception)
+        builder.apply(freeze=True)
+
+        frozen = advice_cache[FrozenTarget][FrozenTarget.increment_count]
+        self.assertTrue(isinstance(frozen, FrozenAdvice))
+        self.assertFalse(hasattr(frozen, '__dict__'))
+        self.assertRaises(TypeError, setattr, frozen, 'preludes', ())
+
+        # Frozen advice implements only the hooks it has functions for, and shares its type with advice like it.
+        self.assertTrue(type(frozen).encore.im_func is IdentityAspect.encore.im_func)
+        self.assertTrue(type(frozen) is type(builder.advice[FrozenTarget.increment_count].freeze()))
+
+        target = FrozenTarget()
+        target.increment_count()
+        target.raise_exception()
+        self.assertEqual((target.count, target.exceptions_handled), (1+2, 1))
+
+        # Later additions to the builder don't change frozen advice.
+        builder.add_encore(FrozenTarget.increment_count, increment_count)
+        target.increment_count()
+        self.assertEqual(target.count, (1+2) + (1+2))
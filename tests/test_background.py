@@ -0,0 +1,83 @@
+import unittest
+from threading import Event
+from drawer import weave_clazz, IdentityAspect, BackgroundAspect
+from drawer.background import DROP, INLINE
+
+
+class Target(object):
+    def __init__(self):
+        self.calls = 0
+
+    def foo(self, value, scale=1):
+        self.calls += 1
+        return value * scale
+
+
+class Recorder(IdentityAspect):
+    def __init__(self, release=None):
+        self.records = []
+        self.release = release
+
+    def prelude(self, attribute, context, *args, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        self.records.append(('prelude', attribute, context, args, kwargs))
+
+    def encore(self, attribute, context, result):
+        self.records.append(('encore', attribute, context, result))
+
+
+class BackgroundAspectTestCase(unittest.TestCase):
+
+    def test_background_hooks(self):
+        class BackgroundTarget(Target):
+            pass
+
+        recorder = Recorder()
+        background = BackgroundAspect(recorder)
+        weave_clazz(BackgroundTarget, {BackgroundTarget.foo: background})
+
+        target = BackgroundTarget()
+        self.assertEqual(target.foo(2, scale=3), 6)
+        background.join()
+        background.close()
+
+        self.assertEqual(recorder.records, [('prelude', 'BackgroundTarget.foo', id(target), (2,), {'scale': 3}),
+                                            ('encore', 'BackgroundTarget.foo', id(target), 6)])
+
+    def test_backpressure(self):
+        class PressuredTarget(Target):
+            pass
+
+        release = Event()
+        recorder = Recorder(release)
+        background = BackgroundAspect(recorder, hooks=('prelude',), maxsize=1, policy=DROP)
+        weave_clazz(PressuredTarget, {PressuredTarget.foo: background})
+
+        target = PressuredTarget()
+        [target.foo(value) for value in range(5)]
+
+        # Encores aren't offloaded, so run as each call finishes; at most two preludes were queued or in progress.
+        self.assertEqual([record[3] for record in recorder.records], [0, 1, 2, 3, 4])
+        self.assertTrue(background.dropped >= 3)
+
+        release.set()
+        background.join()
+        background.close()
+        self.assertEqual(len(recorder.records), 5 + 5 - background.dropped)
+
+    def test_inline_policy(self):
+        background = BackgroundAspect(Recorder(), workers=0, maxsize=1, policy=INLINE)
+        self.assertEqual(background.around.im_func, IdentityAspect.around.im_func)
+
+        target = Target()
+        background.prelude(Target.foo, target, 1)
+        background.prelude(Target.foo, target, 2)
+        self.assertEqual(background.aspect.records, [('prelude', 'Target.foo', id(target), (2,), {})])
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, BackgroundAspect, Recorder(), policy='wait')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from threading import Event
+from drawer import weave_clazz, asynchronous, AdviceBuilder, BatchingAspect
+from helpers import Future
+
+
+class Store(object):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @asynchronous
+    def lookup(self, key):
+        raise AssertionError('Lookups should be batched.')
+
+
+class BatchingAspectTestCase(unittest.TestCase):
+
+    def test_batching_by_size(self):
+        batches = []
+
+        def lookup_many(calls):
+            batches.append(calls)
+            return [context.prefix + key for context, args, kwargs in calls for key in args]
+
+        class SizedStore(Store):
+            pass
+
+        weave_clazz(SizedStore, {SizedStore.lookup: BatchingAspect(lookup_many, size=3, future_type=Future)})
+
+        store = SizedStore('key-')
+        futures = [store.lookup(key) for key in 'abcd']
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([future.result() for future in futures[:3]], ['key-a', 'key-b', 'key-c'])
+        self.assertEqual(futures[3].outcome, None)
+
+    def test_batching_by_window(self):
+        done = Event()
+
+        class WindowedStore(Store):
+            pass
+
+        aspect = BatchingAspect(lambda calls: [args[0].upper() for context, args, kwargs in calls],
+                                window=0.01, future_type=Future)
+        weave_clazz(WindowedStore, {WindowedStore.lookup: aspect})
+
+        store = WindowedStore('')
+        first, second = store.lookup('a'), store.lookup('b')
+        second.add_done_callback(lambda future: done.set())
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual([first.result(), second.result()], ['A', 'B'])
+
+    def test_failed_batches_and_encores(self):
+        results = []
+
+        def failing(calls):
+            raise KeyError('unavailable')
+
+        def record(attribute, context, result):
+            results.append(result)
+
+        class FailingStore(Store):
+            pass
+
+        batching = BatchingAspect(failing, size=5, future_type=Future)
+        builder = AdviceBuilder()
+        builder.add_around(FailingStore.lookup, batching)
+        builder.add_encore(FailingStore.lookup, record)
+        builder.apply()
+
+        store = FailingStore('')
+        futures = [store.lookup('a'), store.lookup('b')]
+        batching.flush()
+
+        self.assertRaises(KeyError, futures[0].result)
+        self.assertRaises(KeyError, futures[1].result)
+        self.assertEqual(results, [])
+
+        batching.batch = lambda calls: ['ok'] * len(calls)
+        future = store.lookup('c')
+        batching.flush()
+        self.assertEqual((future.result(), results), ('ok', ['ok']))
+
+    def test_needs_size_or_window(self):
+        self.assertRaises(ValueError, BatchingAspect, lambda calls: [], future_type=Future)
+
+
+if __name__ == '__main__':
+    unittest.main()
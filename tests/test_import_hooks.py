@@ -0,0 +1,77 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from drawer import ImportWeaver, prelude
+
+MODULE_SOURCE = '''
+calls = []
+
+class Greeter(object):
+    def greet(self, name):
+        calls.append(name)
+        return 'hello ' + name
+
+def shout(name):
+    return name.upper()
+'''
+
+
+class ImportWeaverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, 'hooked_package'))
+        with open(os.path.join(self.directory, 'hooked_package', '__init__.py'), 'w') as package:
+            package.write('')
+        with open(os.path.join(self.directory, 'hooked_package', 'greeting.py'), 'w') as module:
+            module.write(MODULE_SOURCE)
+
+        sys.path.insert(0, self.directory)
+        self.weaver = ImportWeaver()
+        self.weaver.install()
+        self.advised = []
+
+    def tearDown(self):
+        self.weaver.uninstall()
+        sys.path.remove(self.directory)
+        for name in ('hooked_package', 'hooked_package.greeting'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.directory)
+
+    def record(self, name):
+        @prelude
+        def record_call(attribute, context, *args, **kwargs):
+            self.advised.append((name, args))
+        return record_call
+
+    def test_weaving_on_import(self):
+        self.weaver.register('hooked_package.greeting.Greeter.greet', self.record('greet'))
+        self.weaver.register('hooked_package.greeting.shout', self.record('shout'))
+        self.assertNotIn('hooked_package.greeting', sys.modules)
+
+        from hooked_package import greeting
+
+        self.assertEqual(greeting.Greeter().greet('world'), 'hello world')
+        self.assertEqual(greeting.shout('world'), 'WORLD')
+        self.assertEqual(self.advised, [('greet', ('world',)), ('shout', ('world',))])
+        self.assertEqual(self.weaver.pending(), set())
+
+    def test_weaving_already_imported(self):
+        from hooked_package import greeting
+
+        self.weaver.register('hooked_package.greeting.Greeter.greet', self.record('greet'))
+        greeting.Greeter().greet('again')
+        self.assertEqual(self.advised, [('greet', ('again',))])
+
+    def test_unresolved_names_stay_pending(self):
+        self.weaver.register('hooked_package.greeting.Greeter.missing', self.record('missing'))
+
+        import hooked_package.greeting
+
+        self.assertEqual(self.weaver.pending(), {'hooked_package.greeting.Greeter.missing'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from drawer import weave_clazz, AdviceBuilder, MemoizingAspect, ProfilingAspect
+from helpers import FakeTimer
+
+
+class Target(object):
+    def __init__(self):
+        self.calls = 0
+
+    def square(self, x):
+        self.calls += 1
+        return x * x
+
+    def total(self, values):
+        self.calls += 1
+        return sum(values)
+
+    def scaled(self, value, factor=1):
+        self.calls += 1
+        return value * factor
+
+    def describe(self, value):
+        return 'describe%s' % value
+
+    def label(self, value):
+        return 'label%s' % value
+
+
+class MemoizingAspectTestCase(unittest.TestCase):
+
+    def test_memoization(self):
+        memo = MemoizingAspect()
+        weave_clazz(Target, {Target.square: memo})
+
+        target = Target()
+        self.assertEqual([target.square(3), target.square(3), target.square(4)], [9, 9, 16])
+        self.assertEqual(target.calls, 2)
+        self.assertEqual(memo.statistics(), {'hits': 1, 'misses': 2, 'size': 2})
+
+        # Results are shared between instances unless they're cached per instance.
+        other = Target()
+        other.square(3)
+        self.assertEqual(other.calls, 0)
+
+    def test_per_instance(self):
+        memo = MemoizingAspect(per_instance=True)
+        weave_clazz(Target, {Target.square: memo})
+
+        target, other = Target(), Target()
+        target.square(3)
+        other.square(3)
+        self.assertEqual((target.calls, other.calls), (1, 1))
+
+        memo.invalidate(context=target)
+        target.square(3)
+        other.square(3)
+        self.assertEqual((target.calls, other.calls), (2, 1))
+
+    def test_lru_eviction(self):
+        memo = MemoizingAspect(maxsize=2)
+        weave_clazz(Target, {Target.square: memo})
+
+        target = Target()
+        [target.square(x) for x in (1, 2, 1, 3, 1, 2)]
+
+        # 2 is evicted by 3, being less recently used than 1, and so must be computed again.
+        self.assertEqual(target.calls, 4)
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        memo = MemoizingAspect(ttl=10, timer=timer)
+        weave_clazz(Target, {Target.square: memo})
+
+        target = Target()
+        target.square(3)
+        timer.now = 5
+        target.square(3)
+        timer.now = 11
+        target.square(3)
+
+        self.assertEqual(target.calls, 2)
+
+    def test_unhashable_arguments_and_invalidation(self):
+        memo = MemoizingAspect()
+        builder = AdviceBuilder()
+        builder.add_around(Target.total, memo)
+        builder.add_around(Target.scaled, memo)
+        builder.apply()
+
+        target = Target()
+        target.total([1, 2])
+        target.total([1, 2])
+        self.assertEqual(target.calls, 2)
+
+        target.total((1, 2))
+        target.total((1, 2))
+        self.assertEqual(target.calls, 3)
+
+        memo.invalidate(Target.total)
+        target.total((1, 2))
+        self.assertEqual(target.calls, 4)
+
+        target.scaled(2, factor=[3])
+        target.scaled(2, factor=[3])
+        self.assertEqual(target.calls, 6)
+
+    def test_stacked_arounds(self):
+        class StackedTarget(Target):
+            pass
+
+        memo, profiler = MemoizingAspect(), ProfilingAspect()
+        builder = AdviceBuilder()
+        for method in (StackedTarget.describe, StackedTarget.label):
+            builder.add_around(method, memo).add_around(method, profiler.around)
+        builder.apply()
+
+        # Methods sharing the arounds nested inside the memoizing one mustn't share results.
+        target = StackedTarget()
+        self.assertEqual((target.describe(1), target.label(1)), ('describe1', 'label1'))
+        self.assertEqual((target.describe(1), target.label(1)), ('describe1', 'label1'))
+        self.assertEqual(memo.statistics(), {'hits': 2, 'misses': 2, 'size': 2})
+
+        memo.invalidate(StackedTarget.label)
+        self.assertEqual(memo.statistics()['size'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+from drawer import weave_clazz, AdviceBuilder, MetricsRegistry, ProfilingAspect
+from helpers import FakeTimer
+
+
+class Target(object):
+    def __init__(self, timer):
+        self.timer = timer
+
+    def slow(self):
+        self.timer.now += 2.0
+
+    def raise_exception(self):
+        raise Exception()
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.registry = MetricsRegistry(buckets=(1.0, 5.0), timer=self.timer)
+        aspect = self.registry.aspect()
+        weave_clazz(Target, {Target.slow: aspect, Target.raise_exception: aspect})
+
+    def test_totals(self):
+        target = Target(self.timer)
+        target.slow()
+        target.slow()
+        self.assertRaises(Exception, target.raise_exception)
+
+        totals = self.registry.totals()
+
+        self.assertEqual(totals['Target.slow']['calls'], 2)
+        self.assertEqual(totals['Target.slow']['latency_sum'], 4.0)
+        self.assertEqual(totals['Target.slow']['latency_buckets'], [(1.0, 0), (5.0, 2), (None, 2)])
+        self.assertEqual(totals['Target.raise_exception']['calls'], 1)
+        self.assertEqual(totals['Target.raise_exception']['exceptions'], 1)
+
+    def test_stacked_arounds(self):
+        class StackedTarget(Target):
+            pass
+
+        builder = AdviceBuilder()
+        builder.add_around(StackedTarget.slow, self.registry.aspect().around)
+        builder.add_around(StackedTarget.slow, ProfilingAspect().around)
+        builder.apply()
+
+        target = StackedTarget(self.timer)
+        [target.slow() for _ in range(10)]
+
+        # One series for the advised method, not one for each call's chain of arounds.
+        self.assertEqual(self.registry.totals()['StackedTarget.slow']['calls'], 10)
+        self.assertEqual(self.registry.render_prometheus().count('drawer_calls_total{method="StackedTarget.slow"}'), 1)
+        self.assertNotIn('partial', self.registry.render_prometheus())
+
+    def test_threads_are_summed(self):
+        def call_slow():
+            target = Target(FakeTimer())
+            [target.slow() for _ in range(100)]
+
+        threads = [threading.Thread(target=call_slow) for _ in range(4)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        self.assertEqual(self.registry.totals()['Target.slow']['calls'], 400)
+
+    def test_prometheus(self):
+        Target(self.timer).slow()
+
+        rendered = self.registry.render()
+
+        self.assertTrue('# TYPE drawer_calls_total counter' in rendered)
+        self.assertTrue('drawer_calls_total{method="Target.slow"} 1' in rendered)
+        self.assertTrue('drawer_latency_seconds_bucket{method="Target.slow",le="1.0"} 0' in rendered)
+        self.assertTrue('drawer_latency_seconds_bucket{method="Target.slow",le="+Inf"} 1' in rendered)
+        self.assertTrue('drawer_latency_seconds_sum{method="Target.slow"} 2.0' in rendered)
+
+    def test_write(self):
+        Target(self.timer).slow()
+
+        endpoint = StringIO()
+        self.registry.write(endpoint, format='json')
+        self.assertEqual(json.loads(endpoint.getvalue())['Target.slow']['calls'], 1)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'drawer.prom')
+            self.registry.write(path)
+            with open(path) as written:
+                self.assertEqual(written.read(), self.registry.render())
+            self.assertEqual(os.listdir(directory), ['drawer.prom'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_reset(self):
+        Target(self.timer).slow()
+        self.registry.reset()
+        self.assertEqual(self.registry.totals()['Target.slow']['calls'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
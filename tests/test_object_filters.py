@@ -0,0 +1,102 @@
+import unittest
+import drawer.weaver
+from drawer import weave_clazz, compile_clazz, unweave_class, prelude, AttributeFilter, FilterMatcher, SamplingAspect
+
+
+class Target(object):
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.count = 0
+
+    def increment_count(self):
+        self.count += 1
+
+
+class SpecialTarget(Target):
+    pass
+
+
+class FilterMatcherTestCase(unittest.TestCase):
+
+    def test_attribute_filters(self):
+        matcher = FilterMatcher({AttributeFilter('tenant', 'hot'): 'hot', AttributeFilter('tenant', 'cold'): 'cold'})
+
+        self.assertEqual(matcher.match(Target('hot')), 'hot')
+        self.assertEqual(matcher.match(Target('cold')), 'cold')
+        self.assertEqual(matcher.match(Target('lukewarm')), None)
+        self.assertEqual(matcher.match(Target(['unhashable'])), None)
+
+    def test_class_filters(self):
+        matcher = FilterMatcher({Target: 'target', SpecialTarget: 'special'})
+
+        self.assertEqual(matcher.match(Target(None)), 'target')
+        self.assertEqual(matcher.match(SpecialTarget(None)), 'special')  # The nearest class wins.
+        self.assertEqual(matcher.match(object()), None)
+
+    def test_precedence(self):
+        matcher = FilterMatcher({lambda obj: True: 'predicate',
+                                 Target: 'class',
+                                 AttributeFilter('tenant', 'hot'): 'attribute'})
+
+        self.assertEqual(matcher.match(Target('hot')), 'attribute')
+        self.assertEqual(matcher.match(Target('cold')), 'class')
+        self.assertEqual(matcher.match(object()), 'predicate')
+
+    def test_woven_object_filters(self):
+
+        @prelude
+        def add_ten(attribute, context, *args, **kwargs):
+            context.count += 10
+
+        weave_clazz(Target, {Target.increment_count: {AttributeFilter('tenant', 'hot'): add_ten}})
+
+        hot, cold = Target('hot'), Target('cold')
+        hot.increment_count()
+        cold.increment_count()
+
+        self.assertEqual(hot.count, 10+1)
+        self.assertEqual(cold.count, 1)
+
+    def test_filters_are_indexed_once(self):
+
+        class CountingMatcher(FilterMatcher):
+            built = 0
+
+            def __init__(self, filters):
+                CountingMatcher.built += 1
+                super(CountingMatcher, self).__init__(filters)
+
+        @prelude
+        def add_ten(attribute, context, *args, **kwargs):
+            context.count += 10
+
+        class CompiledTarget(Target):
+            pass
+
+        def increment_held_count(target):
+            target.count += 1
+
+        drawer.weaver.FilterMatcher = CountingMatcher
+        try:
+            advice = {AttributeFilter('tenant', 'hot'): add_ten}
+            compile_clazz(CompiledTarget, {CompiledTarget.increment_count: advice})
+            weave_clazz(Target, {increment_held_count: SamplingAspect(advice)})
+            built = CountingMatcher.built
+
+            hot, cold, holder = CompiledTarget('hot'), CompiledTarget('cold'), Target('hot')
+            holder.increment_held_count = increment_held_count
+            for _ in range(3):
+                hot.increment_count()
+                cold.increment_count()
+                holder.increment_held_count(holder)
+
+            self.assertEqual(CountingMatcher.built, built)
+            self.assertEqual((hot.count, cold.count, holder.count), (3*10+3, 3, 3*10+3))
+        finally:
+            drawer.weaver.FilterMatcher = FilterMatcher
+            unweave_class(CompiledTarget)
+            unweave_class(Target)
+
+
+if __name__ == '__main__':
+    unittest.main()
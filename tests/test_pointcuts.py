@@ -0,0 +1,150 @@
+import sys
+import types
+import unittest
+from drawer import weave_clazz, compile_clazz, weave_module, asynchronous, prelude, advice_cache, weaving
+from drawer import Named, Within, Decorated, InModule
+
+
+class Repository(object):
+    def get_one(self):
+        return 1
+
+    def get_many(self):
+        return [1, 2]
+
+    def save(self):
+        return True
+
+    def _get_private(self):
+        return None
+
+
+class UserRepository(Repository):
+    @asynchronous
+    def get_user(self):
+        return 'user'
+
+
+class Unrelated(object):
+    def get_one(self):
+        return 1
+
+
+class PointcutsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.advised = []
+
+        @prelude
+        def record(attribute, context, *args, **kwargs):
+            self.advised.append(attribute.__name__)
+
+        self.record = record
+
+    def test_matching(self):
+        function = Repository.get_one.im_func
+
+        self.assertTrue(Named('get_*').matches(Repository, 'get_one', function))
+        self.assertFalse(Named('get_*').matches(Repository, 'save', function))
+        self.assertFalse(Named('*').matches(Repository, '_get_private', function))
+        self.assertTrue(Named('_*').matches(Repository, '_get_private', function))
+
+        self.assertTrue(Within(Repository).matches(UserRepository, 'get_one', function))
+        self.assertFalse(Within(Repository).matches(Unrelated, 'get_one', function))
+        self.assertFalse(Within(Repository).matches(None, 'get_one', function))
+
+        marked = Decorated('__asynchronous__')
+        self.assertTrue(marked.matches(UserRepository, 'get_user', UserRepository.get_user.im_func))
+        self.assertFalse(marked.matches(Repository, 'get_one', function))
+
+        self.assertTrue(InModule('test_*').matches(Repository, 'get_one', function))
+        self.assertFalse(InModule('drawer.*').matches(Repository, 'get_one', function))
+
+        combined = Named('get_*') & ~Named('get_many') | Named('save')
+        self.assertEqual([name for name in ('get_one', 'get_many', 'save', '_get_private')
+                          if combined.matches(Repository, name, function)], ['get_one', 'save'])
+
+    def test_weave_clazz_with_pointcuts(self):
+        class WovenRepository(UserRepository):
+            pass
+
+        weave_clazz(WovenRepository, {Named('get_*') & Within(Repository): self.record})
+
+        # Pointcuts are resolved to concrete methods when weaving.
+        self.assertEqual(sorted(key.__name__ for key in advice_cache[WovenRepository]),
+                         ['get_many', 'get_one', 'get_user'])
+
+        repository = WovenRepository()
+        repository.get_one(), repository.get_user(), repository.save()
+        self.assertEqual(self.advised, ['get_one', 'get_user'])
+
+    def test_overlapping_pointcuts_are_rejected(self):
+        class OverlappingRepository(Repository):
+            pass
+
+        @prelude
+        def other(attribute, context, *args, **kwargs):
+            pass
+
+        self.assertRaises(ValueError, weave_clazz, OverlappingRepository,
+                          {Named('get_*'): self.record, Within(Repository): other})
+        self.assertFalse(OverlappingRepository in advice_cache)
+
+        # Overlapping pointcuts with the same aspect, or made exclusive, are fine.
+        weave_clazz(OverlappingRepository, {Named('get_*'): self.record, Within(Repository): self.record})
+        weave_clazz(OverlappingRepository, {Named('get_*'): self.record, Within(Repository) & ~Named('get_*'): other})
+        OverlappingRepository().get_one()
+        OverlappingRepository().save()
+        self.assertEqual(self.advised, ['get_one'])
+
+    def test_exact_advice_takes_precedence(self):
+        class CompiledRepository(Repository):
+            pass
+
+        @prelude
+        def other(attribute, context, *args, **kwargs):
+            self.advised.append('other')
+
+        compile_clazz(CompiledRepository, {Named('get_*'): self.record, CompiledRepository.get_many: other})
+
+        repository = CompiledRepository()
+        repository.get_one(), repository.get_many()
+        self.assertEqual(self.advised, ['get_one', 'other'])
+
+    def test_scoped_compiling_with_pointcuts(self):
+        class ScopedRepository(Repository):
+            pass
+
+        with weaving() as scope:
+            scope.compile_clazz(ScopedRepository, {Named('get_*'): self.record})
+            ScopedRepository().get_one()
+
+        ScopedRepository().get_one()
+        self.assertEqual(self.advised, ['get_one'])
+        self.assertTrue(ScopedRepository.get_one.im_func is Repository.get_one.im_func)
+
+    def test_weave_module_with_pointcuts(self):
+        mod = types.ModuleType('pointcut_module')
+        exec('''
+class Store(object):
+    def get_item(self):
+        return 'item'
+
+def get_default():
+    return 'default'
+
+def put_default():
+    return None
+''', mod.__dict__)
+        sys.modules[mod.__name__] = mod
+
+        try:
+            weave_module(mod, {Named('get_*'): self.record})
+            self.assertEqual((mod.Store().get_item(), mod.get_default(), mod.put_default()), ('item', 'default', None))
+            self.assertEqual(self.advised, ['get_item', 'get_default'])
+        finally:
+            del sys.modules[mod.__name__]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import unittest
+from multiprocessing import Pool
+from drawer import weave_clazz, compile_clazz, ProcessPoolAspect
+from helpers import Future
+
+
+class Worker(object):
+    def __init__(self, scale):
+        self.scale = scale
+        self.lock = None
+
+    def compute(self, value):
+        if value < 0:
+            raise ValueError('negative')
+        return value * self.scale, os.getpid()
+
+
+class Pooled(Worker):
+    pass
+
+
+class Compiled(Worker):
+    pass
+
+
+class Stateful(Worker):
+    pass
+
+
+def restore_worker(clazz, scale):
+    return clazz(scale)
+
+
+class ProcessPoolAspectTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = Pool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.pool.join()
+
+    def test_calls_run_in_workers(self):
+        aspect = ProcessPoolAspect(self.pool)
+        weave_clazz(Pooled, {Pooled.compute: aspect})
+
+        result, pid = Pooled(3).compute(2)
+        self.assertEqual(result, 6)
+        self.assertNotEqual(pid, os.getpid())
+        self.assertRaises(ValueError, Pooled(3).compute, -1)
+
+        # Objects which can't be pickled are called inline.
+        unpicklable = Pooled(3)
+        unpicklable.lock = lambda: None
+        self.assertEqual(unpicklable.compute(2), (6, os.getpid()))
+        self.assertEqual(aspect.inline_calls, 1)
+
+    def test_compiled_and_futures(self):
+        aspect = ProcessPoolAspect(self.pool, future_type=Future)
+        compile_clazz(Compiled, {Compiled.compute: aspect})
+
+        future = Compiled(2).compute(5)
+        self.assertTrue(future.done.wait(5))
+
+        self.assertEqual(future.outcome[0][0], 10)
+        self.assertNotEqual(future.outcome[0][1], os.getpid())
+
+    def test_state_extraction_and_map(self):
+        aspect = ProcessPoolAspect(self.pool, extract_state=lambda worker: worker.scale, restore_state=restore_worker)
+        weave_clazz(Stateful, {Stateful.compute: aspect})
+
+        unpicklable = Stateful(4)
+        unpicklable.lock = lambda: None
+        self.assertEqual(unpicklable.compute(1)[0], 4)
+        self.assertEqual(aspect.inline_calls, 0)
+
+        results = aspect.map(Stateful.compute, [(Stateful(scale), (scale,)) for scale in range(6)], chunksize=2)
+        self.assertEqual([result for result, _ in results], [0, 1, 4, 9, 16, 25])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import threading
+import unittest
+from drawer import weave_clazz, AdviceBuilder, ProfilingAspect
+from helpers import FakeTimer
+
+
+class Target(object):
+    def __init__(self, timer):
+        self.timer = timer
+
+    def outer(self):
+        self.timer.now += 1.0
+        self.inner()
+        self.timer.now += 1.0
+
+    def inner(self):
+        self.timer.now += 0.5
+
+    def raise_exception(self):
+        self.timer.now += 2.0
+        raise Exception()
+
+
+class ProfilingAspectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.profiler = ProfilingAspect(buckets=(1.0, 2.0), timer=self.timer)
+
+    def test_calls_and_times(self):
+        weave_clazz(Target, {Target.outer: self.profiler, Target.inner: self.profiler})
+
+        target = Target(self.timer)
+        target.outer()
+        target.inner()
+
+        snapshot = self.profiler.snapshot()
+
+        self.assertEqual(snapshot['Target.outer']['calls'], 1)
+        self.assertEqual(snapshot['Target.outer']['total_time'], 2.5)
+        self.assertEqual(snapshot['Target.outer']['self_time'], 2.0)  # The nested call to inner isn't self time.
+        self.assertEqual(snapshot['Target.inner']['calls'], 2)
+        self.assertEqual(snapshot['Target.inner']['self_time'], 1.0)
+
+        self.assertEqual(snapshot['Target.outer']['histogram'], [(1.0, 0), (2.0, 0), (None, 1)])
+        self.assertEqual(snapshot['Target.inner']['histogram'], [(1.0, 2), (2.0, 0), (None, 0)])
+
+    def test_exceptions_are_timed(self):
+        builder = AdviceBuilder()
+        builder.add_advice(Target.raise_exception, self.profiler)
+        builder.apply()
+
+        self.assertRaises(Exception, Target(self.timer).raise_exception)
+
+        snapshot = self.profiler.snapshot()
+        self.assertEqual(snapshot['Target.raise_exception']['calls'], 1)
+        self.assertEqual(snapshot['Target.raise_exception']['histogram'], [(1.0, 0), (2.0, 1), (None, 0)])
+
+    def test_stacked_arounds(self):
+        class StackedTarget(Target):
+            pass
+
+        builder = AdviceBuilder()
+        builder.add_around(StackedTarget.inner, self.profiler.around)
+        builder.add_around(StackedTarget.inner, ProfilingAspect().around)
+        builder.apply()
+
+        target = StackedTarget(self.timer)
+        [target.inner() for _ in range(10)]
+
+        # Figures are kept for the advised method, not the arounds nested inside the profiler's.
+        self.assertEqual(self.profiler.snapshot().keys(), ['StackedTarget.inner'])
+        self.assertEqual(self.profiler.snapshot()['StackedTarget.inner']['calls'], 10)
+
+    def test_threads(self):
+        class ThreadedTarget(Target):
+            pass
+
+        weave_clazz(ThreadedTarget, {ThreadedTarget.inner: self.profiler})
+
+        def call_repeatedly():
+            target = ThreadedTarget(FakeTimer())
+            [target.inner() for _ in range(2000)]
+
+        threads = [threading.Thread(target=call_repeatedly) for _ in range(4)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        self.assertEqual(self.profiler.snapshot()['ThreadedTarget.inner']['calls'], 4 * 2000)
+
+    def test_reset(self):
+        weave_clazz(Target, {Target.inner: self.profiler})
+        Target(self.timer).inner()
+
+        self.profiler.reset()
+
+        self.assertEqual(self.profiler.snapshot()['Target.inner']['calls'], 0)
+        self.assertEqual(self.profiler.snapshot()['Target.inner']['total_time'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
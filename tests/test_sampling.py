@@ -0,0 +1,51 @@
+import unittest
+from drawer import weave_clazz, prelude, SamplingAspect
+
+
+class Target(object):
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+
+    def increment_count(self):
+        self.count += 1
+
+
+@prelude
+def count_sample(attribute, context, *args, **kwargs):
+    context.sampled += 1
+
+
+class SamplingAspectTestCase(unittest.TestCase):
+
+    def test_every(self):
+        sampler = SamplingAspect(count_sample, every=3)
+        weave_clazz(Target, {Target.increment_count: sampler})
+
+        target = Target()
+        [target.increment_count() for _ in range(9)]
+
+        self.assertEqual(target.count, 9)
+        self.assertEqual(target.sampled, 3)
+
+        # Sampling can be changed without weaving again.
+        sampler.every = 1
+        [target.increment_count() for _ in range(3)]
+        self.assertEqual(target.sampled, 6)
+
+    def test_probability(self):
+        sampler = SamplingAspect(count_sample, probability=0.0)
+        weave_clazz(Target, {Target.increment_count: sampler})
+
+        target = Target()
+        [target.increment_count() for _ in range(10)]
+        self.assertEqual(target.sampled, 0)
+
+        sampler.probability = 1.0
+        [target.increment_count() for _ in range(10)]
+        self.assertEqual(target.sampled, 10)
+        self.assertEqual(target.count, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from drawer import weave_clazz, StreamingAspect
+
+
+class Rows(object):
+    def __init__(self):
+        self.produced = 0
+        self.closed = False
+
+    def fetch(self, count, fail_at=None):
+        try:
+            for row in range(count):
+                if row == fail_at:
+                    raise IOError('connection lost')
+                self.produced += 1
+                yield row
+        except GeneratorExit:
+            self.closed = True
+            raise
+
+    def fetch_list(self, count):
+        return list(range(count))
+
+
+class Recorder(StreamingAspect):
+    def __init__(self, swallow_errors=False):
+        self.events = []
+        self.swallow_errors = swallow_errors
+
+    def yielded(self, attribute, context, item):
+        self.events.append(('yielded', item, context.produced))
+
+    def exhausted(self, attribute, context):
+        self.events.append(('exhausted',))
+
+    def iteration_error(self, attribute, context, exception):
+        self.events.append(('error', str(exception)))
+        if not self.swallow_errors:
+            raise exception
+
+
+class StreamingAspectTestCase(unittest.TestCase):
+
+    def weave(self, aspect):
+        class WovenRows(Rows):
+            pass
+
+        weave_clazz(WovenRows, {WovenRows.fetch: aspect, WovenRows.fetch_list: aspect})
+        return WovenRows()
+
+    def test_items_are_streamed(self):
+        recorder = Recorder()
+        rows = self.weave(recorder)
+
+        stream = rows.fetch(3)
+        self.assertEqual(recorder.events, [])
+
+        # Each item is seen as it's produced, not after the generator has run to completion.
+        self.assertEqual(next(stream), 0)
+        self.assertEqual(recorder.events, [('yielded', 0, 1)])
+
+        self.assertEqual(list(stream), [1, 2])
+        self.assertEqual(recorder.events, [('yielded', 0, 1), ('yielded', 1, 2), ('yielded', 2, 3), ('exhausted',)])
+
+    def test_iteration_errors(self):
+        recorder = Recorder()
+        rows = self.weave(recorder)
+        self.assertRaises(IOError, list, rows.fetch(3, fail_at=1))
+        self.assertEqual(recorder.events, [('yielded', 0, 1), ('error', 'connection lost')])
+
+        recorder = Recorder(swallow_errors=True)
+        rows = self.weave(recorder)
+        self.assertEqual(list(rows.fetch(3, fail_at=2)), [0, 1])
+
+    def test_early_close_and_non_iterators(self):
+        recorder = Recorder()
+        rows = self.weave(recorder)
+
+        stream = rows.fetch(3)
+        next(stream)
+        stream.close()
+        self.assertTrue(rows.closed)
+        self.assertNotIn(('exhausted',), recorder.events)
+
+        self.assertEqual(rows.fetch_list(2), [0, 1])
+        self.assertEqual(recorder.events, [('yielded', 0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
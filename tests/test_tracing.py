@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import unittest
+from drawer import weave_clazz, AdviceBuilder, ProfilingAspect, TracingAspect
+from helpers import FakeTimer
+
+
+class Service(object):
+    def handle(self, fail=False):
+        return self.load(fail) + self.load(fail)
+
+    def load(self, fail):
+        if fail:
+            raise IOError('unavailable')
+        return 1
+
+
+class TracingAspectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        class TracedService(Service):
+            pass
+
+        self.tracer = TracingAspect(timer=FakeTimer(step=1.0))
+        weave_clazz(TracedService, {TracedService.handle: self.tracer, TracedService.load: self.tracer})
+        self.service = TracedService()
+
+    def test_spans(self):
+        self.assertEqual(self.service.handle(), 2)
+
+        spans = self.tracer.spans()
+        self.assertEqual([(span['name'], span['start'], span['duration']) for span in spans],
+                         [('TracedService.handle', 1.0, 5.0), ('TracedService.load', 2.0, 1.0),
+                          ('TracedService.load', 4.0, 1.0)])
+        self.assertEqual([span['parent'] for span in spans], [None, spans[0]['id'], spans[0]['id']])
+
+        self.assertRaises(IOError, self.service.handle, True)
+        self.assertEqual([span['failed'] for span in self.tracer.spans()[3:]], [True, True])
+
+    def test_stacked_arounds(self):
+        class StackedService(Service):
+            pass
+
+        tracer = TracingAspect(timer=FakeTimer(step=1.0))
+        builder = AdviceBuilder()
+        builder.add_around(StackedService.load, tracer.around).add_around(StackedService.load, ProfilingAspect().around)
+        builder.apply()
+
+        [StackedService().load(False) for _ in range(100)]
+
+        # Spans are named for the advised method, not the arounds nested inside the tracer's, however many calls.
+        self.assertEqual(set(span['name'] for span in tracer.spans()), {'StackedService.load'})
+        self.assertEqual(len(tracer._names), 1)
+
+    def test_ring_buffer(self):
+        tracer = TracingAspect(capacity=4, timer=FakeTimer(step=1.0))
+
+        class SmallService(Service):
+            pass
+
+        weave_clazz(SmallService, {SmallService.load: tracer})
+        [SmallService().load(False) for _ in range(10)]
+
+        self.assertEqual([span['id'] for span in tracer.spans()], [7, 8, 9, 10])
+
+        tracer.reset()
+        self.assertEqual(tracer.spans(), [])
+
+    def test_exports(self):
+        self.service.handle()
+
+        events = json.loads(self.tracer.render('chrome'))['traceEvents']
+        self.assertEqual([(event['name'], event['ph'], event['ts'], event['dur']) for event in events],
+                         [('TracedService.handle', 'X', 1e6, 5e6), ('TracedService.load', 'X', 2e6, 1e6),
+                          ('TracedService.load', 'X', 4e6, 1e6)])
+
+        self.assertEqual(self.tracer.render('folded'),
+                         'TracedService.handle 3000000\nTracedService.handle;TracedService.load 2000000\n')
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'trace.folded')
+        self.tracer.write(path, 'folded')
+        with open(path) as written:
+            self.assertEqual(written.read(), self.tracer.render('folded'))
+        os.remove(path)
+        os.rmdir(directory)
+
+        self.assertRaises(ValueError, self.tracer.render, 'svg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,12 @@
+import gc
+import threading
+import types
 import unittest
+import weakref
 from drawer import weave_clazz, prelude, encore, error_handler, generate_around_advice
+from drawer import advice_cache, weaving, weave_module, unweave_module, compile_clazz, unweave_class
+from drawer import IdentityAspect, asynchronous, weave_many
+from helpers import Future
 
 
 class CountingAspect(object):
@@ -12,6 +19,7 @@ class CountingAspect(object):
     def encore(self, attribute, context, result):
         pass
 
+
 class Target(object):
 
     def __init__(self):
@@ -139,6 +147,370 @@ class WeaverTestCase(unittest.TestCase):
 
         self.assertEqual(target.count, 5+1+1)
 
+    def test_compiled_weaving(self):
+
+        class CompiledTarget(object):
+            count = 0
+
+            def foo(self):
+                return self
+
+            def increment_count(self):
+                self.count += 1
+
+        original_foo = CompiledTarget.__dict__['foo']
+        counting_aspect = CountingAspect()
+        compile_clazz(CompiledTarget, {CompiledTarget.foo: counting_aspect})
+
+        target = CompiledTarget()
+        target.foo().foo()
+        target.increment_count()
+
+        self.assertEqual(2, counting_aspect.invocations)
+        self.assertEqual(target.count, 1)
+        self.assertEqual(CompiledTarget.__getattribute__, object.__getattribute__)
+
+        # Recompiling replaces the aspect rather than stacking another on top.
+        compile_clazz(CompiledTarget, {CompiledTarget.foo: counting_aspect})
+        target.foo()
+        self.assertEqual(3, counting_aspect.invocations)
+
+        unweave_class(CompiledTarget)
+        target.foo()
+        self.assertEqual(3, counting_aspect.invocations)
+        self.assertTrue(CompiledTarget.__dict__['foo'] is original_foo)
+
+    def test_compiling_leaves_class_methods_callable(self):
+
+        class CompiledTarget(object):
+            @classmethod
+            def create(cls, count):
+                return count
+
+        class CompiledSubclass(CompiledTarget):
+            pass
+
+        counting_aspect = CountingAspect()
+        compile_clazz(CompiledTarget, {CompiledTarget.create: counting_aspect})
+        compile_clazz(CompiledSubclass, {CompiledSubclass.create: counting_aspect})
+
+        self.assertEqual(CompiledTarget.create(3), 3)
+        self.assertEqual(CompiledSubclass().create(4), 4)
+        self.assertTrue(isinstance(CompiledTarget.__dict__['create'], classmethod))
+        self.assertFalse('create' in CompiledSubclass.__dict__)
+
+    def test_wrappers_are_cached_until_reweaving(self):
+
+        class CachedTarget(Target):
+            pass
+
+        first_aspect, second_aspect = CountingAspect(), CountingAspect()
+        weave_clazz(CachedTarget, {CachedTarget.foo: first_aspect})
+
+        target = CachedTarget()
+        self.assertTrue(target.foo.im_func is CachedTarget().foo.im_func)
+        target.foo()
+
+        weave_clazz(CachedTarget, {CachedTarget.foo: second_aspect})
+        target.foo()
+
+        self.assertEqual(1, first_aspect.invocations)
+        self.assertEqual(1, second_aspect.invocations)
+
+    def test_unadvised_methods_are_not_wrapped(self):
+
+        class IndexedTarget(object):
+            def foo(self):
+                return self
+
+            def bar(self):
+                return self
+
+        weave_clazz(IndexedTarget, {IndexedTarget.foo: CountingAspect()})
+
+        target = IndexedTarget()
+        self.assertTrue(target.bar.im_func is IndexedTarget.__dict__['bar'])
+        self.assertFalse(target.foo.im_func is IndexedTarget.__dict__['foo'])
+
+    def test_identity_aspects_are_not_applied(self):
+
+        class IdentityTarget(object):
+            def foo(self):
+                return self
+
+            def bar(self):
+                return self
+
+        weave_clazz(IdentityTarget, {IdentityTarget.foo: CountingAspect(), IdentityTarget.bar: IdentityAspect()})
+
+        target = IdentityTarget()
+        self.assertFalse(target.foo.im_func is IdentityTarget.__dict__['foo'])
+
+        # Aspects which don't override any of IdentityAspect's hooks needn't be applied at all.
+        self.assertTrue(target.bar.im_func is IdentityTarget.__dict__['bar'])
+
+    def test_asynchronous_methods(self):
+
+        class AsynchronousTarget(object):
+            def __init__(self):
+                self.pending = Future()
+                self.count = 0
+
+            @asynchronous
+            def fetch(self):
+                return self.pending
+
+        @encore
+        def add_result(attribute, context, result):
+            context.count += result
+
+        @error_handler
+        def handle_exception(attribute, context, exception):
+            context.count = -1
+
+        weave_clazz(AsynchronousTarget, {AsynchronousTarget.fetch: add_result})
+
+        target = AsynchronousTarget()
+        future = target.fetch()
+        self.assertEqual(target.count, 0)  # The encore waits for the result.
+
+        target.pending.set_result(5)
+        self.assertEqual(future.result(), 5)
+        self.assertEqual(target.count, 5)
+
+        weave_clazz(AsynchronousTarget, {AsynchronousTarget.fetch: handle_exception})
+
+        target = AsynchronousTarget()
+        future = target.fetch()
+        target.pending.set_exception(Exception())
+        self.assertEqual(future.result(), None)
+        self.assertEqual(target.count, -1)
+
+    def test_weave_module(self):
+        module = types.ModuleType('woven_module')
+        exec ('def double(x):\n'
+              '    return x * 2\n'
+              '\n'
+              'class ModuleTarget(object):\n'
+              '    def foo(self):\n'
+              '        return self\n', vars(module))
+        module.ImportedTarget = Target
+
+        original_double = module.double
+        counting_aspect = CountingAspect()
+        imported_aspect = CountingAspect()
+
+        weave_module(module, {module.double: counting_aspect,
+                              module.ModuleTarget.foo: counting_aspect,
+                              Target.foo: imported_aspect})
+
+        self.assertEqual(module.double(2), 4)
+        module.ModuleTarget().foo()
+        self.assertEqual(counting_aspect.invocations, 2)
+
+        # Classes imported from other modules aren't woven.
+        Target().foo()
+        self.assertEqual(imported_aspect.invocations, 0)
+
+        unweave_module(module)
+        self.assertTrue(module.double is original_double)
+
+    def test_weave_module_with_inherited_methods(self):
+        module = types.ModuleType('inheriting_module')
+        exec ('class Base(object):\n'
+              '    def foo(self):\n'
+              '        return self\n'
+              '\n'
+              'class Sub(Base):\n'
+              '    def bar(self):\n'
+              '        return self\n', vars(module))
+
+        base_aspect, sub_aspect = CountingAspect(), CountingAspect()
+        weave_module(module, {module.Base.foo: base_aspect, module.Sub.bar: sub_aspect})
+
+        module.Base().foo()
+        module.Sub().foo().bar()
+        self.assertEqual((base_aspect.invocations, sub_aspect.invocations), (2, 1))
+
+    def test_advice_is_replaced_not_changed(self):
+
+        class ReplacedTarget(Target):
+            pass
+
+        first_advice = {ReplacedTarget.foo: CountingAspect()}
+        weave_clazz(ReplacedTarget, first_advice)
+        first_table = advice_cache[ReplacedTarget]
+
+        weave_clazz(ReplacedTarget, {ReplacedTarget.increment_count: CountingAspect()})
+
+        self.assertEqual(len(first_advice), 1)
+        self.assertEqual(len(first_table), 1)
+        self.assertEqual(len(advice_cache[ReplacedTarget]), 2)
+        self.assertRaises(TypeError, first_table.update, {})
+
+    def test_scoped_weaving(self):
+
+        class ScopedTarget(Target):
+            pass
+
+        outer_aspect, inner_aspect = CountingAspect(), CountingAspect()
+        weave_clazz(ScopedTarget, {ScopedTarget.foo: outer_aspect})
+        outer_table = advice_cache[ScopedTarget]
+
+        class CompiledTarget(Target):
+            pass
+
+        with weaving(ScopedTarget, {ScopedTarget.foo: inner_aspect}) as woven:
+            woven.compile_clazz(CompiledTarget, {CompiledTarget.increment_count: inner_aspect})
+            ScopedTarget().foo()
+            CompiledTarget().increment_count()
+
+        self.assertEqual(inner_aspect.invocations, 2)
+        self.assertEqual(advice_cache[ScopedTarget], outer_table)
+        self.assertFalse('increment_count' in CompiledTarget.__dict__)
+
+        # Weaving from before the scope is restored.
+        ScopedTarget().foo()
+        CompiledTarget().increment_count()
+        self.assertEqual(outer_aspect.invocations, 1)
+        self.assertEqual(inner_aspect.invocations, 2)
+
+        unweave_class(ScopedTarget)
+        self.assertFalse(ScopedTarget in advice_cache)
+        self.assertTrue(ScopedTarget.__getattribute__.im_func is Target.__getattribute__.im_func)
+
+    def test_scoped_weaving_undone_out_of_order(self):
+
+        class OverlappingTarget(Target):
+            pass
+
+        first_aspect, second_aspect, third_aspect = CountingAspect(), CountingAspect(), CountingAspect()
+        first = weaving(OverlappingTarget, {OverlappingTarget.foo: first_aspect})
+        second = weaving(OverlappingTarget, {OverlappingTarget.increment_count: second_aspect})
+        third = weaving(OverlappingTarget, {OverlappingTarget.foo: third_aspect})
+        compiled = weaving().compile_clazz(OverlappingTarget, {OverlappingTarget.raise_exception: first_aspect})
+
+        # Undoing the first leaves the others' advice in place, including the third's replacement of its own.
+        first.unweave()
+        OverlappingTarget().foo().increment_count()
+        self.assertEqual((first_aspect.invocations, second_aspect.invocations, third_aspect.invocations), (0, 1, 1))
+
+        # The third's advice then falls back to what was there before the first, not to the first's.
+        third.unweave()
+        OverlappingTarget().foo().increment_count()
+        self.assertEqual((first_aspect.invocations, second_aspect.invocations, third_aspect.invocations), (0, 2, 1))
+
+        second.unweave()
+        compiled.unweave()
+        self.assertFalse(OverlappingTarget in advice_cache)
+        self.assertFalse('__getattribute__' in OverlappingTarget.__dict__)
+        self.assertFalse('raise_exception' in OverlappingTarget.__dict__)
+
+    def test_unweaving_while_called_from_other_threads(self):
+
+        class RacedTarget(Target):
+            pass
+
+        errors, stopping = [], threading.Event()
+
+        def call_repeatedly():
+            while not stopping.is_set():
+                try:
+                    RacedTarget().foo()
+                except Exception as exception:
+                    errors.append(exception)
+
+        callers = [threading.Thread(target=call_repeatedly) for _ in range(3)]
+        [caller.start() for caller in callers]
+        try:
+            for _ in range(1000):
+                weave_clazz(RacedTarget, {RacedTarget.foo: CountingAspect()})
+                unweave_class(RacedTarget)
+                with weaving(RacedTarget, {RacedTarget.foo: CountingAspect()}):
+                    pass
+        finally:
+            stopping.set()
+            [caller.join() for caller in callers]
+
+        self.assertEqual(errors, [])
+
+    def test_woven_classes_can_be_collected(self):
+
+        def weave_discarded_class():
+            class DiscardedTarget(Target):
+                pass
+
+            aspect = CountingAspect()
+            aspect.target_class = DiscardedTarget  # Aspects referring back to the class mustn't keep it alive.
+            weave_clazz(DiscardedTarget, {DiscardedTarget.foo: aspect})
+            DiscardedTarget().foo()
+
+            return weakref.ref(DiscardedTarget), weakref.ref(aspect)
+
+        discarded_class, discarded_aspect = weave_discarded_class()
+        gc.collect()
+
+        self.assertTrue(discarded_class() is None)
+        self.assertTrue(discarded_aspect() is None)
+
+    def test_weave_many(self):
+
+        class FirstTarget(Target):
+            pass
+
+        class SecondTarget(FirstTarget):
+            pass
+
+        first_aspect, second_aspect = CountingAspect(), CountingAspect()
+        weave_many({FirstTarget: {FirstTarget.foo: first_aspect},
+                    SecondTarget: {SecondTarget.increment_count: second_aspect}})
+
+        FirstTarget().foo()
+        SecondTarget().increment_count()
+        self.assertEqual((first_aspect.invocations, second_aspect.invocations), (1, 1))
+
+        # Weaving a class again merges its advice without replacing its __getattribute__.
+        woven_get_attribute = vars(SecondTarget)['__getattribute__']
+        weave_many({SecondTarget: {SecondTarget.foo: second_aspect}})
+        self.assertTrue(vars(SecondTarget)['__getattribute__'] is woven_get_attribute)
+
+        SecondTarget().foo()
+        SecondTarget().increment_count()
+        self.assertEqual(second_aspect.invocations, 3)
+
+        # Unweaving the subclass leaves its superclass's woven __getattribute__ behind, which mustn't be mistaken for
+        # its own when it's woven again.
+        unweave_class(SecondTarget)
+        weave_many({SecondTarget: {SecondTarget.increment_count: second_aspect}})
+        SecondTarget().increment_count()
+        self.assertEqual(second_aspect.invocations, 4)
+
+    def test_decorated_advice_shares_compact_types(self):
+
+        def first(attribute, context, *args, **kwargs):
+            context.invocations += 1
+
+        def second(attribute, context, *args, **kwargs):
+            context.invocations += 10
+
+        # Each decorated function is held by an instance of one shared type, rather than by a class of its own.
+        aspects = [prelude(first), prelude(second)]
+        self.assertTrue(type(aspects[0]) is type(aspects[1]))
+        self.assertFalse(hasattr(aspects[0], '__dict__'))
+        self.assertTrue(type(encore(first)) is type(encore(second)))
+        self.assertTrue(type(error_handler(first)) is type(error_handler(second)))
+        self.assertTrue(type(generate_around_advice(first, second)) is type(generate_around_advice(second, first)))
+
+        class CompactTarget(object):
+            def __init__(self):
+                self.invocations = 0
+
+            def foo(self):
+                return self.invocations
+
+        weave_clazz(CompactTarget, {CompactTarget.foo: aspects[1]})
+        self.assertEqual(CompactTarget().foo(), 10)
+
 
 if __name__ == '__main__':
     unittest.main()